@@ -0,0 +1,124 @@
+#! python3
+# bench_cleanup.py - times cleanup() against the original per-port implementation
+# Author- David Sullivan
+#
+# Generates a synthetic masscan output file and runs both the old cleanup (one pass
+# over the results for every port, re-sort and rewrite on every match) and the
+# single pass pyscanners.parser.cleanup() against it. parse_file() is also timed on
+# the same results in list (-oL) and binary (-oB) format, in one process and
+# spread over -w worker processes.
+#
+# Usage: python3 benchmarks/bench_cleanup.py -l 1000000 -p 20
+
+import getopt, os, shutil, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyscanners import parser
+from pyscanners.parser import cleanup, parse_file
+from synthetic import generate
+
+
+def usage():
+    print('bench_cleanup- python3')
+    print()
+    print('Usage: python3 benchmarks/bench_cleanup.py -l 1000000 -p 20')
+    print('-------------------------------------------------------------------------')
+    print('-l   --lines         -number of result lines to generate (default 1000000)')
+    print('-p   --ports         -number of distinct ports in the output (default 20)')
+    print('-s   --skip-legacy   -only time the new cleanup()')
+    print('-w   --workers       -processes for the parallel parse (default one per CPU)')
+    print('-c   --chunk         -MB per parse chunk (default %d)' % (parser.chunk_size // (1024 * 1024)))
+    print('-h   --help          -print this help file')
+    sys.exit()
+
+
+def legacy_cleanup(ports, target, output):
+    # cleanup() as shipped in omnislash.py v1.0.3, minus the progress print
+    oList = []
+    newList = []
+
+    compareList = ports.split(',')
+    for portno in range(len(compareList)):
+        compareList[portno] = ('%s/tcp' % compareList[portno])
+
+    f = open(output, 'r')
+    for line in f:
+        if not line.startswith('Discovered'):
+            # the original crashed here on split()[3]
+            continue
+        oList.append([(line.split()[3]), (line.split()[-1])])
+    f.close()
+
+    for portno in compareList:
+        for result in range(len(oList)):
+            if oList[result][0] == portno:
+                newList.append(oList[result][1])
+                newList = list(set(newList))
+                newList.sort(key=lambda s: list(map(int, s.split('.'))))
+                out = open(('%s_%s' % (output, (portno.split('/')[0]))), 'w')
+                for address in newList:
+                    out.write(address + '\n')
+                out.close()
+                newList = []
+
+
+def timed(function, ports, output):
+    start = time.perf_counter()
+    function(ports, '', output)
+    return time.perf_counter() - start
+
+
+def main():
+    lines = 1000000
+    ports = 20
+    skip_legacy = False
+    workers = os.cpu_count() or 1
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'l:p:w:c:sh',
+                                   ['lines=', 'ports=', 'workers=', 'chunk=', 'skip-legacy', 'help'])
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+
+    for o, a in opts:
+        if o in ('-h', '--help'):
+            usage()
+        elif o in ('-l', '--lines'):
+            lines = int(a)
+        elif o in ('-p', '--ports'):
+            ports = int(a)
+        elif o in ('-s', '--skip-legacy'):
+            skip_legacy = True
+        elif o in ('-w', '--workers'):
+            workers = int(a)
+        elif o in ('-c', '--chunk'):
+            parser.chunk_size = int(a) * 1024 * 1024
+
+    workdir = tempfile.mkdtemp(prefix='bench_cleanup_')
+    try:
+        output = os.path.join(workdir, 'output')
+        print('Generating %d lines over %d ports' % (lines, ports))
+        portString = generate(output, lines, ports)
+
+        new = timed(cleanup, portString, output)
+        print('single pass cleanup:  %8.2fs  (%d lines/s)' % (new, lines / new))
+
+        for name, path in (('console', output), ('list', output + '.list'), ('binary', output + '.bin')):
+            # the binary format is always read in one pass
+            for count in sorted(set([1, workers if name != 'binary' else 1])):
+                start = time.perf_counter()
+                parse_file(path, count)
+                seconds = time.perf_counter() - start
+                print('parse %-7s %2d proc: %8.2fs  (%d lines/s)' % (name, count, seconds, lines / seconds))
+
+        if not skip_legacy:
+            old = timed(legacy_cleanup, portString, output)
+            print('legacy cleanup:       %8.2fs  (%d lines/s)' % (old, lines / old))
+            print('speedup:              %8.1fx' % (old / new))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
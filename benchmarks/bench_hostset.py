@@ -0,0 +1,97 @@
+#! python3
+# bench_hostset.py - compares HostSet with the old list-of-strings handling
+# Author- David Sullivan
+#
+# Dedups and sorts a batch of random IPv4 addresses (with repeats) both the way
+# cleanup() used to, set() then sort with a list-of-ints key, and through a
+# HostSet, reporting the time taken and the peak memory of each.
+#
+# Usage: python3 benchmarks/bench_hostset.py -n 2000000
+
+import getopt, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pyscanners.hostset import HostSet
+
+
+def usage():
+    print('bench_hostset- python3')
+    print()
+    print('Usage: python3 benchmarks/bench_hostset.py -n 2000000')
+    print('-------------------------------------------------------------------------')
+    print('-n   --number        -number of addresses to add, a quarter are repeats (default 2000000)')
+    print('-h   --help          -print this help file')
+    sys.exit()
+
+
+def strings(addresses):
+    unique = list(set(addresses))
+    unique.sort(key=lambda s: list(map(int, s.split('.'))))
+    return unique
+
+
+def hostset(addresses):
+    hosts = HostSet(addresses)
+    len(hosts)
+    return hosts
+
+
+def held(result):
+    # bytes the finished result keeps alive, strings included
+    if isinstance(result, HostSet):
+        packed = result.packed()
+        return sys.getsizeof(packed)
+    return sys.getsizeof(result) + sum(sys.getsizeof(address) for address in result)
+
+
+def measure(function, addresses):
+    # timed on its own, tracemalloc slows every allocation down
+    start = time.perf_counter()
+    result = function(addresses)
+    elapsed = time.perf_counter() - start
+    del result
+
+    tracemalloc.start()
+    result = function(addresses)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak, held(result)
+
+
+def main():
+    number = 2000000
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'n:h', ['number=', 'help'])
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+
+    for o, a in opts:
+        if o in ('-h', '--help'):
+            usage()
+        elif o in ('-n', '--number'):
+            number = int(a)
+
+    rand = random.Random(number)
+    unique = ['10.%d.%d.%d' % (rand.randint(0, 255), rand.randint(0, 255), rand.randint(0, 255))
+              for i in range(number * 3 // 4)]
+    addresses = unique + rand.sample(unique, number - len(unique))
+    rand.shuffle(addresses)
+    print('%d addresses' % number)
+
+    old, oldTime, oldPeak, oldSize = measure(strings, addresses)
+    new, newTime, newPeak, newSize = measure(hostset, addresses)
+    if old != list(new):
+        print('results differ!')
+        sys.exit(1)
+
+    print('strings:  %6.2fs  peak %7.1f MB  %7.1f MB once built' % (oldTime, oldPeak / 1048576.0,
+                                                                     oldSize / 1048576.0))
+    print('HostSet:  %6.2fs  peak %7.1f MB  %7.1f MB once built' % (newTime, newPeak / 1048576.0,
+                                                                     newSize / 1048576.0))
+    print('speedup:  %6.1fx, %.0fx less memory held' % (oldTime / newTime, oldSize / float(max(1, newSize))))
+
+
+if __name__ == '__main__':
+    main()
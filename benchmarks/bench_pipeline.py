@@ -0,0 +1,187 @@
+#! python3
+# bench_pipeline.py - times a full omnislash.py run against synthetic masscan output
+# Author- David Sullivan
+#
+# Generates a masscan result set, puts stub tools from synthetic.py first on PATH
+# and runs omnislash's main() end to end in a scratch folder. Reports how fast the
+# results are parsed, how long each phase took (from output_metrics.json), the
+# per-job dispatch overhead on top of the stubs' own latency and start-up time,
+# and the end-to-end time.
+#
+# The ideal plugin time is the stubs' latency and start-up spread over the -j
+# workers, or their start-up alone (CPU bound) spread over the CPUs if that is longer.
+#
+# Usage: python3 benchmarks/bench_pipeline.py -l 1000000 -H 200 -j 16 -L nikto=0.5,0.05
+
+import getopt, glob, json, os, runpy, shutil, subprocess, sys, tempfile, time
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+from pyscanners.parser import parse_file
+from pyscanners.plugins import all_ports
+from synthetic import generate, stub_tools, write_stubs
+
+
+def usage():
+    print('bench_pipeline- python3')
+    print()
+    print('Usage: python3 benchmarks/bench_pipeline.py -l 1000000 -H 200 -j 16 -L nikto=0.5,0.05')
+    print('-------------------------------------------------------------------------')
+    print('-l   --lines         -number of masscan results to generate (default 100000)')
+    print('-p   --ports         -number of other random ports in the results (default 20)')
+    print('-H   --hosts         -hosts with every plugin port open, these get plugin jobs (default 50)')
+    print('-L   --latency       -seconds each stub tool takes, a number for all of them and/or')
+    print('                      tool=seconds, e.g. nikto=2,0.1 (default 0)')
+    print('-O   --output-size   -bytes each stub tool prints (default 1024)')
+    print('-j   --jobs          -omnislash -j (default 8)')
+    print('-e   --extra         -more omnislash arguments, e.g. "-S -b 64"')
+    print('-k   --keep          -keep the scratch folder and print where it is')
+    print('-h   --help          -print this help file')
+    sys.exit()
+
+
+def parse_latency(spec):
+    # '0.1' or 'nikto=2,0.1' -> {tool: seconds} for every stub tool
+    latency = dict((tool, 0.0) for tool in stub_tools)
+    for item in spec.split(','):
+        tool, sep, seconds = item.strip().rpartition('=')
+        if not seconds:
+            continue
+        if tool and tool not in latency:
+            raise ValueError('no stub for %r' % tool)
+        for name in ([tool] if tool else stub_tools):
+            latency[name] = float(seconds)
+    return latency
+
+
+def stub_startup(folder, env, runs=20):
+    # seconds it takes to start and finish one stub with no latency, which is the
+    # floor for every job whatever omnislash does
+    env = dict(env, BENCH_LATENCY_SHOWMOUNT='0')
+    start = time.perf_counter()
+    for i in range(runs):
+        subprocess.call([os.path.join(folder, 'showmount'), '-e', '127.0.0.1'], env=env, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - start) / runs
+
+
+def run_omnislash(workdir, arguments):
+    # run omnislash.py as __main__, the way the command line does
+    argv, cwd = sys.argv, os.getcwd()
+    sys.argv = [os.path.join(root, 'omnislash.py')] + arguments
+    os.chdir(workdir)
+    start = time.perf_counter()
+    try:
+        runpy.run_path(sys.argv[0], run_name='__main__')
+    finally:
+        elapsed = time.perf_counter() - start
+        sys.argv = argv
+        os.chdir(cwd)
+    return elapsed
+
+
+def main():
+    lines = 100000
+    ports = 20
+    hosts = 50
+    latency = parse_latency('0')
+    output_size = 1024
+    jobs = 8
+    extra = []
+    keep = False
+
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], 'l:p:H:L:O:j:e:kh',
+                                   ['lines=', 'ports=', 'hosts=', 'latency=', 'output-size=', 'jobs=', 'extra=',
+                                    'keep', 'help'])
+    except getopt.GetoptError as err:
+        print(str(err))
+        usage()
+
+    for o, a in opts:
+        if o in ('-h', '--help'):
+            usage()
+        elif o in ('-l', '--lines'):
+            lines = int(a)
+        elif o in ('-p', '--ports'):
+            ports = int(a)
+        elif o in ('-H', '--hosts'):
+            hosts = int(a)
+        elif o in ('-L', '--latency'):
+            try:
+                latency = parse_latency(a)
+            except ValueError as err:
+                print(str(err))
+                usage()
+        elif o in ('-O', '--output-size'):
+            output_size = int(a)
+        elif o in ('-j', '--jobs'):
+            jobs = int(a)
+        elif o in ('-e', '--extra'):
+            extra = a.split()
+        elif o in ('-k', '--keep'):
+            keep = True
+
+    workdir = tempfile.mkdtemp(prefix='bench_pipeline_')
+    env = dict(os.environ)
+    try:
+        results = os.path.join(workdir, 'results')
+        print('Generating %d results, %d hosts with plugin ports open' % (lines, hosts))
+        portString = generate(results, lines, ports, hosts, all_ports())
+
+        stubs = os.path.join(workdir, 'stubs')
+        os.mkdir(stubs)
+        write_stubs(stubs)
+        os.environ['PATH'] = stubs + os.pathsep + os.environ.get('PATH', '')
+        os.environ['BENCH_RESULTS'] = results
+        os.environ['BENCH_OUTPUT'] = str(output_size)
+        for tool, seconds in latency.items():
+            os.environ['BENCH_LATENCY_%s' % tool.upper()] = str(seconds)
+
+        start = time.perf_counter()
+        parse_file(results)
+        parse = time.perf_counter() - start
+        startup = stub_startup(stubs, os.environ)
+
+        scan = os.path.join(workdir, 'scan')
+        os.mkdir(scan)
+        devnull = open(os.devnull, 'w')
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            # learned runtimes go in the scratch folder, the stubs' timings must not end
+            # up in ~/.omnislash/estimates.json where real scans schedule from them
+            total = run_omnislash(scan, ['-t', '10.0.0.0/8', '-p', portString, '-o', 'bench', '-a',
+                                         '-j', str(jobs), '-L', os.path.join(workdir, 'estimates.json')] + extra)
+        finally:
+            sys.stdout = stdout
+            devnull.close()
+
+        metrics = json.load(open(glob.glob(os.path.join(scan, '*_metrics.json'))[0]))
+        phases = metrics['phases']
+        runs = dict((tool, counts.get('started', 0)) for tool, counts in metrics['jobs'].items())
+        started = sum(runs.values())
+        workers = max(1, jobs)
+        ideal = max(sum(count * (latency.get(tool, 0.0) + startup) for tool, count in runs.items()) / workers,
+                    started * startup / min(workers, os.cpu_count() or 1))
+
+        print('parse:       %8.2fs  %d results/s (parse_file)' % (parse, lines / parse))
+        for name in ('masscan', 'cleanup', 'plan', 'plugins'):
+            if name in phases:
+                print('%-12s %8.2fs' % (name + ':', phases[name]))
+        print('jobs:        %8d  %s' % (started, ', '.join('%s %d' % item for item in sorted(runs.items()))))
+        print('stub start:  %8.1fms per run' % (startup * 1000))
+        if started:
+            overhead = (phases.get('plugins', 0.0) - ideal) / started
+            print('ideal:       %8.2fs  for the stubs alone with -j %d on %d CPUs' % (ideal, jobs, os.cpu_count() or 1))
+            print('dispatch:    %8.1fms per job over the ideal' % (overhead * 1000))
+        print('end to end:  %8.2fs' % total)
+    finally:
+        os.environ.clear()
+        os.environ.update(env)
+        if keep:
+            print('Scratch folder kept in %s' % workdir)
+        else:
+            shutil.rmtree(workdir)
+
+
+if __name__ == '__main__':
+    main()
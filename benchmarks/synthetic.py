@@ -0,0 +1,136 @@
+#! python3
+# synthetic.py - synthetic masscan output and stub tools for the benchmarks
+# Author- David Sullivan
+#
+# generate() writes a fake masscan result set, write_stubs() puts stand-ins for
+# masscan, nmap, nikto, enum4linux and showmount in a folder that can go first on
+# PATH. The masscan stub replays the generated results (console, -oL list output,
+# --shards), the others sleep for a set latency, print a set amount of output and
+# write the XML reports omnislash parses, so a full run needs no network.
+
+import os, random, socket, stat, struct, sys
+
+# stubs written by write_stubs(), the latency and output size of each are read
+# from BENCH_LATENCY_<TOOL> and BENCH_OUTPUT when it runs
+stub_tools = ['masscan', 'nmap', 'nikto', 'enum4linux', 'showmount']
+
+stub_common = '''#!%(python)s
+import os, sys, time
+args = sys.argv[1:]
+
+
+def opt(name):
+    return args[args.index(name) + 1] if name in args else None
+
+
+time.sleep(float(os.environ.get('BENCH_LATENCY_%(upper)s', '0')))
+size = int(os.environ.get('BENCH_OUTPUT', '1024'))
+line = '%(tool)s ' + ' '.join(args) + '\\n'
+sys.stdout.write((line * (size // len(line) + 1))[:size])
+'''
+
+stub_bodies = {
+    'masscan': '''
+# replay the generated results, every shard takes every shards'th line
+shard, shards = 1, 1
+if opt('--shards'):
+    shard, shards = map(int, opt('--shards').split('/'))
+listFormat = opt('-oL') is not None
+source = open(os.environ['BENCH_RESULTS'] + ('.list' if listFormat else ''))
+out = sys.stdout if opt('-oL') in (None, '-') else open(opt('-oL'), 'w')
+if shards == 1:
+    for block in iter(lambda: source.read(1 << 20), ''):
+        out.write(block)
+else:
+    header = 0 if listFormat else 1
+    for i, result in enumerate(source):
+        if i < header or (i - header) %% shards == shard - 1:
+            out.write(result)
+out.close()
+''',
+    'nmap': '''
+hosts = [host.strip() for host in open(opt('-iL'))] if opt('-iL') else [args[-1]]
+if opt('-oX'):
+    out = open(opt('-oX'), 'w')
+    out.write('<?xml version="1.0"?><nmaprun>')
+    for host in hosts:
+        out.write('<host><status state="up"/><address addr="%%s" addrtype="ipv4"/><ports>'
+                  '<port protocol="tcp" portid="%%s"><state state="open"/>' %% (host, opt('-p')))
+        for script in (opt('--script') or '').split(','):
+            out.write('<script id="%%s" output="%%s output"/>' %% (script, script))
+        out.write('</port></ports></host>')
+    out.write('</nmaprun>')
+    out.close()
+''',
+    'nikto': '''
+# -h is a host or a file of host:port / https://host:port/ lines
+if os.path.isfile(opt('-h')):
+    targets = [line.strip().split('://')[-1].strip('/').rsplit(':', 1) for line in open(opt('-h')) if line.strip()]
+else:
+    targets = [(opt('-h'), opt('-p'))]
+if opt('-o'):
+    out = open(opt('-o'), 'w')
+    out.write('<?xml version="1.0"?><niktoscan>')
+    for host, port in targets:
+        out.write('<scandetails targetip="%%s" targetport="%%s"><item id="999990"><description>Allowed HTTP '
+                  'Methods: GET, HEAD</description><uri>/</uri></item></scandetails>' %% (host, port))
+    out.write('</niktoscan>')
+    out.close()
+''',
+}
+
+
+def generate(path, lines, ports, hosts=0, plugin_ports=()):
+    # masscan console output with the odd status line mixed in, plus the same
+    # results in -oL list format at path.list and -oB binary format at path.bin.
+    # lines results are spread over ports
+    # random ports and random 10.x addresses, except that the first hosts
+    # addresses (10.255.x.x) get every one of plugin_ports so the plugins have
+    # a known amount of work. Returns the ports as a comma string.
+    rand = random.Random(lines)
+    portList = [str(p) for p in rand.sample(range(1, 65536), ports)]
+    console = open(path, 'w')
+    listing = open(path + '.list', 'w')
+    binary = open(path + '.bin', 'wb')
+    # the binary header and trailer are records of type 'm' with a length of 'a'
+    header = b'masscan/1.1\ns:0\n'.ljust(99, b'\0')
+    binary.write(header)
+    console.write('Starting masscan 1.0.4 (http://bit.ly/14GZzcT) at 2018-02-14 00:00:00 GMT\n')
+    listing.write('#masscan\n')
+
+    results = []
+    for i in range(hosts):
+        address = '10.255.%d.%d' % (i // 254, i % 254 + 1)
+        results += [(str(port), address) for port in plugin_ports]
+    for i in range(max(0, lines - len(results))):
+        results.append((rand.choice(portList),
+                        '10.%d.%d.%d' % (rand.randint(0, 254), rand.randint(0, 255), rand.randint(1, 254))))
+
+    for i, (port, address) in enumerate(results):
+        console.write('Discovered open port %s/tcp on %s\n' % (port, address))
+        listing.write('open tcp %s %s 1517000000\n' % (port, address))
+        binary.write(struct.pack('!BBIIBHBB', 6, 13, 1517000000, struct.unpack('!I', socket.inet_aton(address))[0],
+                                 6, int(port), 0x12, 64))
+        if not i % 100000:
+            console.write('rate:  0.00-kpps, 100.00%% done, waiting 0-secs, found=%d\n' % i)
+    binary.write(header)
+    console.close()
+    listing.close()
+    binary.close()
+    return ','.join(portList + [str(port) for port in plugin_ports])
+
+
+def write_stubs(folder):
+    # returns the folder, put it first on PATH
+    for tool in stub_tools:
+        path = os.path.join(folder, tool)
+        script = stub_common % {'python': sys.executable, 'tool': tool, 'upper': tool.upper()}
+        if tool == 'masscan':
+            # masscan's own output is the results, not filler
+            script = script.replace("sys.stdout.write((line * (size // len(line) + 1))[:size])\n", '')
+        script += stub_bodies.get(tool, '') % {}
+        out = open(path, 'w')
+        out.write(script)
+        out.close()
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return folder
@@ -1,24 +1,35 @@
 #! python3
-# massNikto.py - v1.0
+# massNikto.py - v1.0.4
 # Author- David Sullivan
 #
 # Runs masscan against its target list and automatically runs the results against nikto
 #
 # Revision  1.0     -   02/14/2018- Initial creation of script
-
-# To do:
-#   -   does not support port ranges other than pre-defined ranges, otherwise you need to specify comma-delimited ports
-
-
-import getopt, os, sys, datetime
+#           1.0.1   -   10/18/2026- cleanup() moved to pyscanners.parser (single pass over the output)
+#           1.0.2   -   10/18/2026- Ports are a PortSpec of ranges (e.g. 1-1024,8000-8100), nikto only
+#                                   looks at ports that actually turned up in the results
+#           1.0.3   -   10/18/2026- Only runs when started as a script, importing it no longer starts a scan
+#           1.0.4   -   10/18/2026- nikto runs through pyscanners.web, one run per batch of hosts on a port
+#                                   (-w) with -maxtime per host (-W), findings parsed into _nikto_findings.csv
+
+
+import csv, getopt, sys, datetime
+from pyscanners import print_progress
+from pyscanners.masscan import masscan
+from pyscanners.parser import cleanup
+from pyscanners.plugins import plugins
+from pyscanners.portspec import PortSpec
+from pyscanners.runner import Runner
+from pyscanners.web import WebBatcher
 
 # globals
 ports = ''
 target = ''
 output = ''
+jobs = 1
+web_batch = 16
+maxtime = None
 time = (str(datetime.datetime.now()).split(' ')[0])
-all_ports = list(range(0, 65536))
-well_known_ports = list(range(0, 1024))
 
 
 def usage():
@@ -27,10 +38,13 @@ def usage():
     print('Usage: python3 massNikto.py -t 192.168.1.0/24 -p 80,443,8080 -o output')
     print('-------------------------------------------------------------------------')
     print('-t   --target        -target network')
-    print('-p   --port          -ports to scan (need to be comma separated)')
+    print('-p   --port          -ports to scan, comma separated ports and ranges e.g. 1-1024,8000-8100')
     print('-p   --port          -p all or --port all will scan for all ports')
     print('-p   --port          -p wk or --port wk will scan ports 0-1023')
     print('-o   --output        -output file location (do not give it a file type)')
+    print('-j   --jobs          -nikto runs at once (default 1)')
+    print('-w   --web-batch     -hosts per nikto run (default 16)')
+    print('-W   --maxtime       -seconds nikto may spend on each host')
     print('-h   --help          -print this help file')
     print('-------------------------------------------------------------------------')
     print('***Requires MassScan and Nikto to be installed***')
@@ -38,76 +52,33 @@ def usage():
     sys.exit()
 
 
-def masscan(ports, target, output):
-    print('Running masscan against %s using ports %s' % (target, ports))
-    arguments = 'masscan -p %s %s --wait=0 > %s' % (ports, target, output)
-    os.system(arguments)
-
-
-def cleanup(ports, target, output):
-    oList = []
-    newList = []
-
-    # Build a working list to compare ports against
-    compareList = ports.split(',')
-    for portno in range(len(compareList)):
-        compareList[portno] = ('%s/tcp' % compareList[portno])
-
-    f = open(output, 'r')
-    print('Cleaning up output')
-
-    # extract the IP address and Port from each line
-    for line in f:
-        oList.append([(line.split()[3]), (line.split()[-1])])
-    f.close()
-
-    # sort the results to different output files based on port
-    for portno in compareList:
-        for result in range(len(oList)):
-            if oList[result][0] == portno:
-                newList.append(oList[result][1])
-
-                # remove duplicates and put in numerical order by IP
-                newList = list(set(newList))
-                newList.sort(key=lambda s: list(map(int, s.split('.'))))
-
-                # save/overwrite file
-                out = open(('%s_%s' % (output, (portno.split('/')[0]))), 'w')
-                for address in newList:
-                    out.write(address + '\n')
-                out.close()
-                newList = []
-
-
-def nikto(ports, target, output):
-    # Build a working list to compare ports against
-    nports = list(ports.split(','))
-
-    for iPort in nports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run nikto against each argument
-            for address in oList:
-                print('Running nikto against %s:%s' % (address, iPort))
-                arguments = ('nikto -h %s -p %s >> %s 2>&1' % (address, iPort, ('%s_%s_nikto' % (output, iPort))))
-                os.system(arguments)
-
-            print('Nikto results for port %s can be found in %s_%s_nikto' % (iPort, output, iPort))
-
-        except Exception:
-            pass
+def nikto(ports, target, output, buckets):
+    # only the ports that actually turned up in the results, buckets comes from cleanup()
+    findings = []
+    runner = Runner(jobs, {}, {}, None, lambda job: findings.extend(job.findings.get('nikto', [])))
+    web = WebBatcher(runner, output, plugins['nikto'], web_batch, maxtime,
+                     outfile=lambda port: '%s_%s_nikto' % (output, port))
+    found = [iPort for iPort in sorted(buckets) if iPort in ports]
+    for iPort in found:
+        for address in buckets[iPort]:
+            web.add(address, iPort)
+    web.flush()
+    runner.wait()
+
+    for iPort in found:
+        print('Nikto results for port %s can be found in %s_%s_nikto' % (iPort, output, iPort))
+    out = open('%s_nikto_findings.csv' % output, 'w', newline='')
+    writer = csv.writer(out)
+    writer.writerow(['address', 'port', 'finding', 'detail'])
+    for address, iPort, finding, detail in sorted(findings, key=lambda row: (row[1] or 0, row[0])):
+        writer.writerow([address, iPort, finding, detail])
+    out.close()
+    print('%d nikto findings can be found in %s_nikto_findings.csv' % (len(findings), output))
 
 
 # noinspection PyBroadException
 def main():
-    global ports, target, output, opts, all_ports, well_known_ports
+    global ports, target, output, opts, jobs, web_batch, maxtime
 
     # if no arguments given, run usage
     if not len(sys.argv[1:]):
@@ -115,8 +86,8 @@ def main():
 
     # read the commandline options
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'h:t:p:o:h',
-                                   ['help', 'target', 'port', 'output'])
+        opts, args = getopt.getopt(sys.argv[1:], 'h:t:p:o:j:w:W:h',
+                                   ['help', 'target', 'port', 'output', 'jobs=', 'web-batch=', 'maxtime='])
     except getopt.GetoptError as err:
         print(str(err))
         usage()
@@ -131,18 +102,21 @@ def main():
             ports = a
         elif o in ('-o', '--output'):
             output = a
+        elif o in ('-j', '--jobs'):
+            jobs = int(a)
+        elif o in ('-w', '--web-batch'):
+            web_batch = int(a)
+        elif o in ('-W', '--maxtime'):
+            maxtime = int(a)
         else:
             assert False, 'Unhandled option'
 
-    # if all or well known ports are selected, create all ports list
-    if ports == 'all':
-        nports = ','.join(str(x) for x in all_ports)
-        ports = '0-65535'
-    elif ports == 'wk':
-        nports = ','.join(str(x) for x in well_known_ports)
-        ports = '0-1023'
-    else:
-        nports = ports
+    # all, wk, single ports and ranges all become one compact spec
+    try:
+        ports = PortSpec(ports)
+    except ValueError as err:
+        print(str(err))
+        usage()
 
     # add timestamp and range to output
     if '/' not in target:
@@ -150,11 +124,13 @@ def main():
     output = ('%s_%s_%s' % (output, time, ('%s-%s' % ((target.split('/')[0]), (target.split('/')[1])))))
 
     # call masscan and run Nikto
-    masscan(ports, target, output)
-    cleanup(nports, target, output)
-    nikto(nports, target, output)
+    masscan(str(ports), target, output)
+    buckets = cleanup(ports, target, output)
+    nikto(ports, target, output, buckets)
 
     print('Masscan results can be found in %s (with appended port results)' % output)
 
 
-main()
+if __name__ == '__main__':
+    print_progress()
+    main()
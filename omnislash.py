@@ -1,5 +1,5 @@
 #! python3
-# omnislash.py - v1.0.3
+# omnislash.py - v1.2.4
 # Author- David Sullivan
 #
 # Runs masscan against its target list and automatically cleans up the
@@ -27,18 +27,74 @@
 #           1.0.2   -   01/27/2017- Added support for mysql-enum.nse and mysql-empty-password.nse,
 #                                   ms-sql-info.nse
 #           1.0.3   -   02/14/2018- Some debugging, got rid of empty files generated, etc.
+#           1.0.4   -   10/18/2026- cleanup() moved to pyscanners.parser, single pass over the masscan
+#                                   output instead of once per port, skips lines that are not results
+#           1.0.5   -   10/18/2026- Added -S/--stream to start plugins on each result while masscan is
+#                                   still running, plugins share one per-host command table
+#           1.0.6   -   10/18/2026- Plugin jobs run on a worker pool (-j/--jobs) with per tool caps
+#                                   (-l/--limits), each job's output is captured before being appended
+#           1.0.7   -   10/18/2026- .nse plugins run as one nmap per port and batch of hosts (-b/--batch)
+#                                   with every script for that port combined, results split per plugin
+#           1.0.8   -   10/18/2026- Per tool timeouts (-T/--timeouts) and a whole run deadline (-D/--deadline),
+#                                   jobs that run over are killed and listed in output_timeouts.json
+#           1.0.9   -   10/18/2026- Plugin jobs are planned before they run, duplicate (tool, host) work is
+#                                   dropped, enum4linux/showmount run once per host, -P/--plan dry run
+#           1.1.0   -   10/18/2026- SQLite journal (output.sqlite) records phases, results and job states,
+#                                   -R/--resume skips finished work after an interruption
+#           1.1.1   -   10/18/2026- -d/--diff compares against a previous run, only new services get plugin
+#                                   runs, unchanged ones reuse the cached output, changes in output_changes.json
+#           1.1.2   -   10/18/2026- Sharded masscan: -k runs --shards workers locally, -E writes per-node job
+#                                   specs, -M merges node outputs into one deduplicated result set
+#           1.1.3   -   10/18/2026- output.sqlite is the results store, nmap and nikto findings are parsed from
+#                                   their XML and queried with -Q, text files are optional (-F) or exported (-X)
+#           1.1.4   -   10/18/2026- Phase timings, per tool and per host job latencies and masscan throughput
+#                                   saved to output_metrics.json/.prom, -I refreshes them during the run
+#           1.1.5   -   10/18/2026- Plugins are entries in the pyscanners.plugins registry and work from the
+#                                   in-memory result index, nmap batches no longer re-read the per-port files
+#           1.1.6   -   10/18/2026- -r sets a packets per second budget for masscan (split between shards),
+#                                   -A adapts plugin concurrency up to -j, backing off on errors and timeouts
+#           1.1.7   -   10/18/2026- Services are classified from masscan --banners (-B) or a probe (-C), plugins
+#                                   only run against matching services and nikto gets -ssl for TLS ports
+#           1.1.8   -   10/18/2026- Queued jobs are scheduled by learned per tool runtimes (quick checks first,
+#                                   workers shared between tools), -y sets tool or host priorities
+#           1.1.9   -   10/18/2026- masscan binary output (-oB) is accepted wherever results are read, large
+#                                   outputs are memory-mapped and parsed in chunks over a process pool
+#           1.2.0   -   10/18/2026- Hosts that fail -H jobs in a row (timeouts, unreachable) and a re-check probe
+#                                   are marked down and their remaining jobs skipped
+#           1.2.1   -   10/18/2026- Only runs when started as a script, pyscanners.api.scan() runs a scan from
+#                                   Python and yields its results
+#           1.2.2   -   10/18/2026- -U runs omnislash as a daemon taking scan requests on a Unix socket, with
+#                                   recurring scans and queued requests coalesced into one masscan run
+#           1.2.3   -   10/18/2026- Target files (-G) and exclusions (-x) are merged into one set of ranges,
+#                                   a whole inventory is one masscan run and one output
+#           1.2.4   -   10/18/2026- nikto runs through the pyscanners.web engine shared with massNikto: host
+#                                   lists in batches (-w), -maxtime per host (-W), any port classified as web
 #
 # To do:
 #   -   add support for more tools
 #   -   configure plugins to take arguments for port results to scan against (overriding
 #       defaults will require replacing getopt)
 #   -   clean up output so it is less verbose
-#   -   work on a timeout for Nikto running against https (hangs pretty bad)
-#   -   implement threading
 #   -   create separate help file
-#   -   combine all ports when running enum4linux and only run against 1 set of IPs (reduces duplication)
 
-import getopt, os, sys, datetime
+import collections, getopt, os, sys, datetime
+from pyscanners import print_progress
+from pyscanners.daemon import Daemon
+from pyscanners.diff import compare, find_previous, job_findings, load_previous, result_pairs, save_report, \
+    unchanged_job
+from pyscanners.engine import Config, Engine
+from pyscanners.journal import Journal, find_journal, job_id, journal_path
+from pyscanners.masscan import masscan, masscan_sharded, masscan_stream, merge_outputs, shard_specs, write_specs
+from pyscanners.metrics import Metrics
+from pyscanners.parser import cleanup, ip_key, write_ports
+from pyscanners.planner import job_key, plan, plan_summary, port_dependent
+from pyscanners.plugins import all_ports, plugins, registry
+from pyscanners.portspec import PortSpec
+from pyscanners.ratecontrol import RateController
+from pyscanners.runner import parse_limits
+from pyscanners.scheduler import estimates_path, parse_priorities
+from pyscanners.services import accepts, probe, read_banners
+from pyscanners.targets import TargetSet
 
 # globals
 ports = ''
@@ -48,25 +104,34 @@ time = (str(datetime.datetime.now()).split(' ')[0])
 
 # plugin globals
 all_plugins = False
-showmount_plugin = False
-enum4linux_plugin = False
-nikto_plugin = False
-ftpanon_plugin = False
-vnc_plugin = False
-smtpRelay_plugin = False
-mysql_plugin = False
-mssql_plugin = False
-
-# global ports
-ftpanon_ports = [21]
-nikto_ports = [80, 443]
-enum4linux_ports = [137, 139, 445]
-showmount_ports = [2049]
-vnc_ports = [5900]
-smtpRelay_ports = [25, 465, 587]
-mysql_ports = [3306]
-mssql_ports = [445, 1433]
-all_ports = [ftpanon_ports, nikto_ports, mysql_ports, enum4linux_ports, showmount_ports, vnc_ports, smtpRelay_ports]
+selected = set()
+stream = False
+# the options the plugin engine runs with (-j, -l, -T, -D, -b, -r, -y, -L, -H, -N, -w, -W)
+config = Config(estimates=estimates_path)
+plan_only = False
+resume = False
+diff = None
+previous = None
+baseline = None
+shards = 1
+emit_shards = 0
+merge_files = []
+files = False
+export = False
+query = None
+interval = None
+banners = False
+classify = False
+services = {}
+skipped = collections.Counter()
+adaptive = False
+controller = None
+serve = None
+target_files = []
+excludes = []
+journal = None
+metrics = None
+engine = None
 
 
 def usage():
@@ -74,19 +139,50 @@ def usage():
     print()
     print('Usage: python3 omnislash.py -t 192.168.1.0/24 -p 21,22,137 -o output -a')
     print('-------------------------------------------------------------------------')
-    print('-t   --target        -target network')
-    print('-p   --port          -ports to scan (need to be comma seperated)')
+    print('-t   --target        -target network, or several comma separated networks, ranges and addresses')
+    print('-G   --target-file   -comma separated files of networks, ranges (a-b) and addresses to scan as well,')
+    print('                      everything is merged into one masscan run')
+    print('-x   --exclude       -comma separated files (or networks, ranges and addresses) to leave out')
+    print('-p   --port          -ports to scan, comma separated ports and ranges e.g. 21,80,8000-8100')
     print('-p   --port          -p all or --port all will scan for all supported ports')
     print('-o   --output        -output file location (do not give it a file type)')
-    print('-e   --enum4linux    -run the enum4linux plugin')
-    print('-s   --showmount     -run the showmount plugin')
-    print('-n   --nikto         -run the nikto plugin')
-    print('-f   --ftpanon       -run the ftp-anon.nse plugin')
-    print('-m   --mail          -run the smtp-open-relay.nse plugin')
-    print('-i   --mssql         -run the ms-sql-info.nse plugin')
-    print('-q   --mysql         -run the mysql.nse plugins')
-    print('-v   --vnc           -run the vnc.nse scripts plugin')
+    for plugin in registry:
+        print('-%s   %-16s-%s' % (plugin.option[0], '--' + plugin.option[1], plugin.description))
     print('-a   --all           -run all tool plugins automatically')
+    print('-S   --stream        -start plugins on each result while masscan is still running')
+    print('-j   --jobs          -number of plugin jobs to run at once (default 1)')
+    print('-A   --adaptive      -start with one plugin job and work up to -j while jobs succeed, backing off')
+    print('                      when timeouts, errors or refused connections pile up')
+    print('-r   --rate          -packets per second for masscan, split between shards (default masscan\'s own)')
+    print('-B   --banners       -have masscan grab banners and only run plugins against matching services')
+    print('-C   --classify      -probe each open port for its service and only run plugins against matching ones')
+    print('-H   --host-failures -jobs in a row that may time out or fail to reach a host before its remaining')
+    print('                      jobs are skipped, 0 to never skip (default 3)')
+    print('-N   --no-recheck    -give up on such hosts straight away instead of probing them once more')
+    print('-l   --limits        -per tool caps on running jobs, e.g. nikto=4,nmap=16,enum4linux=2')
+    print('-y   --priority      -tools or hosts whose jobs go first, higher first, e.g. nikto=1,10.0.0.0/24=5')
+    print('-L   --estimates     -file the learned tool runtimes are kept in (default %s)' % estimates_path)
+    print('-b   --batch         -hosts per nmap run for the .nse plugins (default 256)')
+    print('-w   --web-batch     -web services per nikto run (default 16)')
+    print('-W   --maxtime       -seconds nikto may spend on each host (nikto -maxtime, defaults to -T nikto)')
+    print('-T   --timeouts      -per tool time limits in seconds, e.g. nikto=1800,enum4linux=600')
+    print('-D   --deadline      -seconds the whole run may take, unfinished jobs are stopped')
+    print('-P   --plan          -run masscan, then print the plugin jobs and their estimated cost without running them')
+    print('-R   --resume        -pick up an interrupted run from its output.sqlite journal')
+    print('-d   --diff          -only run plugins on services that changed since a previous run, give the')
+    print('                      previous output name or last for the newest run of the same range')
+    print('-k   --shards        -split masscan into this many --shards workers on this box and merge them')
+    print('-E   --emit-shards   -write this many per-node masscan job specs instead of scanning')
+    print('-M   --merge         -comma separated masscan outputs (e.g. from -E nodes) to use instead of scanning')
+    print('-F   --files         -also write the per-port and per-tool text files, by default results only go')
+    print('                      to output.sqlite')
+    print('-X   --export        -write the text files from an earlier run\'s output.sqlite, -o is its full output name')
+    print('-Q   --query         -list findings by name or plugin from an earlier run, e.g. -Q ftp-anon or')
+    print('                      -Q nikto=phpinfo to match on the detail, -o is its full output name')
+    print('-U   --serve         -run as a daemon taking scan requests on this Unix socket, the other options')
+    print('                      (-j, -l, -T, -y, ...) apply to every scan it runs')
+    print('-I   --interval      -rewrite output_metrics.json and output_metrics.prom every this many seconds,')
+    print('                      they are always written at the end of the run')
     print('-h   --help          -print this help file')
     print('-------------------------------------------------------------------------')
     print('***Requires MassScan to be installed***')
@@ -105,255 +201,243 @@ def usage():
     sys.exit()
 
 
-def masscan(ports, target, output):
-    print('Running masscan against %s using ports %s' % (target, ports))
-    arguments = 'masscan -p %s %s --wait=0 > %s' % (ports, target, output)
-    os.system(arguments)
-
-
-def cleanup(ports, target, output):
-    oList = []
-    newList = []
-
-    # Build a working list to compare ports against
-    compareList = ports.split(',')
-    for portno in range(len(compareList)):
-        compareList[portno] = ('%s/tcp' % compareList[portno])
-
-    f = open(output, 'r')
-    print('Cleaning up output')
-
-    # extract the IP address and Port from each line
-    for line in f:
-        oList.append([(line.split()[3]), (line.split()[-1])])
-    f.close()
-
-    # sort the results to different output files based on port
-    for portno in compareList:
-        for result in range(len(oList)):
-            if oList[result][0] == portno:
-                newList.append(oList[result][1])
-
-                # remove duplicates and put in numerical order by IP
-                newList = list(set(newList))
-                newList.sort(key=lambda s: list(map(int, s.split('.'))))
-
-                # save/overwrite file
-                out = open(('%s_%s' % (output, (portno.split('/')[0]))), 'w')
-                for address in newList:
-                    out.write(address + '\n')
-                out.close()
-                newList = []
-
-
-def ftpanon(ports, target, output):
-    global ftpanon_ports
-
-    for iPort in ftpanon_ports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run ftp-anon.nse against each argument
-            for address in oList:
-                print('Running ftp-anon.nse against %s:%s' % (address, iPort))
-                arguments = ('nmap -p %s --script ftp-anon %s >> %s 2>&1' % (
-                    iPort, address, ('%s_%s_ftp-anon' % (output, iPort))))
-                os.system(arguments)
-
-            print('ftp-anon.nse results for port %s can be found in %s_%s_ftp-anon' % (iPort, output, iPort))
-
-        except Exception:
-            pass
-
-
-def smtpRelay(ports, target, output):
-    global smtpRelay_ports
-
-    for iPort in smtpRelay_ports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run smtp-open-relay.nse against each argument
-            for address in oList:
-                print('Running smtp-open-relay.nse against %s:%s' % (address, iPort))
-                arguments = ('nmap -p %s --script smtp-open-relay %s >> %s 2>&1' % (
-                    iPort, address, ('%s_%s_smtpRelay' % (output, iPort))))
-                os.system(arguments)
-
-            print('smtp-open-relay.nse results for port %s can be found in %s_%s_smtpRelay' % (iPort, output, iPort))
-
-        except Exception:
-            pass
-
-
-def vncCheck(ports, target, output):
-    global vnc_ports
-
-    for iPort in vnc_ports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run vnc.nse scripts against each argument
-            for address in oList:
-                print('Running vnc.nse scripts against %s:%s' % (address, iPort))
-                arguments = ('nmap -p %s --script vnc-info.nse --script realvnc-auth-bypass.nse %s >> %s 2>&1' % (
-                    iPort, address, ('%s_%s_vnc' % (output, iPort))))
-                os.system(arguments)
-
-            print('vnc.nse results for port %s can be found in %s_%s_vnc' % (iPort, output, iPort))
-
-        except Exception:
-            pass
-
-
-def mysql(ports, target, output):
-    global mysql_ports
-
-    for iPort in mysql_ports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run mysql.nse scripts against each argument
-            for address in oList:
-                print('Running mysql.nse scripts against %s:%s' % (address, iPort))
-                arguments = ('nmap -p %s --script mysql-enum.nse --script mysql-empty-password.nse %s >> %s 2>&1' % (
-                    iPort, address, ('%s_%s_mysql' % (output, iPort))))
-                os.system(arguments)
-
-            print('mysql.nse results for port %s can be found in %s_%s_mysql' % (iPort, output, iPort))
-
-        except Exception:
-            pass
-
-
-def mssql(ports, target, output):
-    global mssql_ports
-
-    for iPort in mssql_ports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run ms-sql-info.nse script against each argument
-            for address in oList:
-                print('Running ms-sql-info.nse script against %s:%s' % (address, iPort))
-                arguments = ('nmap -p %s --script ms-sql-info.nse %s >> %s 2>&1' % (
-                    iPort, address, ('%s_%s_mssql' % (output, iPort))))
-                os.system(arguments)
-
-            print('ms-sql-info.nse results for port %s can be found in %s_%s_mssql' % (iPort, output, iPort))
-
-        except Exception:
-            pass
-
-
-def nikto(ports, target, output):
-    global nikto_ports
-
-    for iPort in nikto_ports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run nikto against each argument
-            for address in oList:
-                print('Running nikto against %s:%s' % (address, iPort))
-                arguments = ('nikto -h %s -p %s >> %s 2>&1' % (address, iPort, ('%s_%s_nikto' % (output, iPort))))
-                os.system(arguments)
-
-            print('Nikto results for port %s can be found in %s_%s_nikto' % (iPort, output, iPort))
-
-        except Exception:
-            pass
-
-
-def enum4linux(ports, target, output):
-    global enum4linux_ports
-
-    for iPort in enum4linux_ports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run enum4linux against each argument
-            for address in oList:
-                print('Running enum4linux against %s:%s' % (address, iPort))
-                arguments = ('enum4linux %s >> %s 2>&1' % (address, ('%s_%s_enum4linux' % (output, iPort))))
-                os.system(arguments)
-
-            print('enum4linux results for port %s can be found in %s_%s_enum4linux' % (iPort, output, iPort))
-
-        except Exception:
-            pass
-
-
-def showmount(ports, target, output):
-    global showmount_ports
-
-    for iPort in showmount_ports:
-        try:
-            oList = []
-            f = open(('%s_%s' % (output, iPort)), 'r')
-
-            # import each line from the list into a variable
-            for line in f:
-                oList.append(line.rstrip())
-            f.close()
-
-            # run showmount against each argument
-            for address in oList:
-                print('Running showmount against %s:%s' % (address, iPort))
-                arguments = ('showmount -e %s >> %s 2>&1' % (address, ('%s_%s_showmount' % (output, iPort))))
-                os.system(arguments)
+def plugin_outfile(name, iPort, output):
+    # tools that do not take a port keep a single results file for every port
+    plugin = plugins[name]
+    if port_dependent(plugin.command):
+        return '%s_%s_%s' % (output, iPort, plugin.suffix)
+    return '%s_%s' % (output, plugin.suffix)
+
+
+def plugin_table(names):
+    # (name, command, ports) for the planner, plugins that discover their services
+    # also get every other port one of those was found on
+    table = []
+    for name in names:
+        plugin = plugins[name]
+        ports = list(plugin.ports)
+        if plugin.discover:
+            ports += sorted(set(port for (address, port), (tag, text) in services.items()
+                                if tag in plugin.services and port not in ports))
+        table.append((name, plugin.command, ports))
+    return table
+
+
+def run_plan(jobs, output):
+    # nmap and web plugins collect their hosts into batches, flush() sends what is left over,
+    # every job's output goes to the results store
+    for name, address, iPort in jobs:
+        engine.dispatch(name, address, iPort, services.get((address, iPort), (None,))[0] == 'tls')
+    engine.flush()
+
+
+def plugin_key(name, address, iPort):
+    return job_key(name, plugins[name].command, address, iPort)
+
+
+def job_finished(job):
+    # engine hook, every job that ends is timed, journaled and fed to the rate controller
+    metrics.job_finished(job)
+    journal_job(job)
+    if adaptive:
+        controller.observe(job)
+
+
+def journal_job(job):
+    # runner hook, records how every plugin job ended along with its output
+    if 'hosts' in job.info:
+        for name in job.info['plugins']:
+            for address in job.info['hosts']:
+                text = job.results.get((name, address))
+                journal.set_job(plugin_key(name, address, job.info['port']), job.status, job.elapsed,
+                                text.encode() if text is not None else None)
+            # hosts that were down by the time the batch started, -R runs them again
+            for address in job.info.get('down', []):
+                journal.set_job(plugin_key(name, address, job.info['port']), 'down')
+    elif 'plugin' in job.info:
+        journal.set_job(plugin_key(job.info['plugin'], job.info['address'], job.info['port']),
+                        job.status, job.elapsed, job.output)
+    for name, findings in job.findings.items():
+        journal.add_findings(name, findings)
+
+
+def export_files(output, port_lists=True):
+    # write the classic text files from the results store: a host list per port and
+    # each plugin's output per port (or per tool), hosts in numerical order
+    if port_lists:
+        write_ports(journal.load_results(), PortSpec('all'), output)
+    rows = [row for row in journal.job_rows() if row[0] in plugins]
+    rows.sort(key=lambda row: (row[0], row[2] or 0, ip_key(row[1])))
+    written = set()
+    for name, address, iPort, text in rows:
+        path = plugin_outfile(name, iPort, output)
+        out = open(path, 'ab' if path in written else 'wb')
+        out.write(text)
+        out.close()
+        written.add(path)
+    return written
+
+
+def find(output, spec):
+    # print the findings matching -Q FINDING[=TEXT]
+    finding, sep, text = spec.partition('=')
+    rows = journal.find(finding, text or None)
+    for plugin, address, iPort, name, detail in rows:
+        lines = detail.splitlines()
+        print('%s:%s  %s  %s' % (address, iPort if iPort is not None else '-', name, lines[0] if lines else ''))
+    print('%d findings for %s in %s' % (len(rows), spec, journal_path(output)))
+
+
+def load_baseline(prefix, name, exclude):
+    # the run -d compares against, loaded before masscan or this run's journal can
+    # replace it, so a mistyped -d stops here instead of after the scan
+    global previous, baseline
+    previous = find_previous(prefix, name, exclude) if diff == 'last' else diff
+    if previous is None:
+        print('No previous run found to compare against, running every plugin')
+        return
+    try:
+        baseline = load_previous(previous)
+    except IOError as err:
+        print(str(err))
+        usage()
 
-            print('showmount results for port %s can be found in %s_%s_showmount' % (iPort, output, iPort))
 
-        except Exception:
-            pass
+def differential(jobs, buckets, output):
+    # reuse the previous run's plugin output for services that have not changed,
+    # returns the jobs that still need to run
+    if baseline is None:
+        return jobs
+    previous_pairs, cached, previous_findings = baseline
+    current_pairs = result_pairs(buckets)
+    new, closed, unchanged = compare(current_pairs, previous_pairs)
+    save_report('%s_changes.json' % output, previous, new, closed, unchanged)
+    print('%d new, %d closed and %d unchanged services since %s, see %s_changes.json' % (
+        len(new), len(closed), len(unchanged), previous, output))
+
+    remaining = []
+    reused = 0
+    for name, address, iPort in jobs:
+        key = plugin_key(name, address, iPort)
+        dependent = port_dependent(plugins[name].command)
+        if job_id(key) in cached and unchanged_job(address, iPort, dependent, plugins[name].ports,
+                                                   current_pairs, previous_pairs):
+            journal.set_job(key, 'done', 0.0, cached[job_id(key)])
+            journal.add_findings(name, job_findings(previous_findings, name, address, key[2]))
+            reused += 1
+        else:
+            remaining.append((name, address, iPort))
+    print('Reused the previous results of %d plugin jobs' % reused)
+    return remaining
+
+
+def classify_services(buckets, output):
+    # tag each result a selected plugin looks at with the service behind it,
+    # from masscan's banners and/or a probe of the ports the banners did not settle
+    if journal.phase_done('services'):
+        return journal.load_services()
+    wanted = set()
+    for name in selected_plugins():
+        wanted.update(plugins[name].ports)
+        if plugins[name].discover:
+            # any open port could turn out to be one of its services
+            wanted.update(buckets)
+    with metrics.phase('services'):
+        found = read_banners(output) if banners else {}
+        if classify:
+            pairs = [(address, port) for port in sorted(wanted) for address in buckets.get(port, ())
+                     if found.get((address, port), (None,))[0] is None]
+            print('Probing %d open ports for their services' % len(pairs))
+            found.update(probe(pairs))
+    journal.save_services(found)
+    journal.finish_phase('services')
+    counts = collections.Counter(tag for tag, text in found.values() if tag)
+    print('Classified %d open ports: %s' % (sum(counts.values()), ', '.join(
+        '%s %d' % item for item in sorted(counts.items())) or 'none'))
+    return found
+
+
+def route(name, address, iPort):
+    # planner hook, a plugin only gets the services it can talk to
+    if accepts(plugins[name], services.get((address, iPort), (None,))[0]):
+        return True
+    skipped[name] += 1
+    return False
+
+
+def selected_plugins():
+    # plugin names in registry order
+    return [plugin.name for plugin in registry if all_plugins or plugin.name in selected]
+
+
+def pipeline(ports, target, output):
+    # dispatch each result to its plugins while masscan is still running
+    done = journal.done_jobs()
+
+    def wanted(name, address, iPort, key):
+        # jobs an earlier attempt finished are left out, the rest are journaled as they are queued
+        if job_id(key) in done:
+            return False
+        journal.add_jobs([key])
+        return True
+
+    metrics.begin('plugins')
+    with metrics.phase('masscan'):
+        for address, iPort in masscan_stream(ports, target, output, controller.masscan_rate()):
+            metrics.add('masscan_results')
+            engine.queue(address, iPort, wanted)
+    journal.finish_phase('masscan')
+
+    # masscan is done, store the results while the plugins catch up
+    engine.flush()
+    with metrics.phase('cleanup'):
+        journal.save_results(cleanup(ports, target, output, files))
+    journal.finish_phase('cleanup')
+
+
+def report(names, output):
+    # wait for the queued plugin jobs and say where their results went
+    engine.wait()
+    runner = engine.runner
+    metrics.end('plugins')
+    journal.finish_phase('plugins')
+    save_metrics(output)
+    if runner.timed_out:
+        runner.save_timeouts('%s_timeouts.json' % output)
+        print('%d jobs timed out, ran past the deadline or were skipped on down hosts, see %s_timeouts.json' % (
+            len(runner.timed_out), output))
+    elif os.path.exists('%s_timeouts.json' % output):
+        # a resumed run that got through everything, the old retry list no longer holds
+        os.remove('%s_timeouts.json' % output)
+    if not files:
+        hosts, services, findings = journal.summary()
+        print('%d hosts, %d open services and %d findings stored in %s' % (hosts, services, findings,
+                                                                           journal_path(output)))
+        print('Query them with -Q, or write the text files with -X -o %s' % output)
+        return
+    export_files(output, False)
+    for name in names:
+        plugin = plugins[name]
+        if not port_dependent(plugin.command):
+            if os.path.exists(plugin_outfile(name, None, output)):
+                print('%s results can be found in %s' % (plugin.label, plugin_outfile(name, None, output)))
+            continue
+        for iPort in plugin.ports:
+            if os.path.exists(plugin_outfile(name, iPort, output)):
+                print('%s results for port %s can be found in %s' % (plugin.label, iPort,
+                                                                      plugin_outfile(name, iPort, output)))
+
+
+def save_metrics(output):
+    metrics.end('total')
+    metrics.stop(output)
+    print('Run metrics can be found in %s_metrics.json and %s_metrics.prom' % (output, output))
 
 
 def main():
-    global ports, target, output, time, all_plugins, enum4linux_plugin, showmount_plugin
-    global vnc_plugin, nikto_plugin, ftpanon_plugin, all_ports, smtpRelay_plugin, mysql_plugin, mssql_plugin
+    global ports, target, output, time, all_plugins
+    global stream, plan_only, resume, diff, engine, journal, shards, emit_shards, merge_files, files, export
+    global query, interval, metrics, adaptive, controller, banners, classify, services, serve, target_files, excludes
 
     # if no arguments given, run usage
     if not len(sys.argv[1:]):
@@ -361,14 +445,23 @@ def main():
 
     # read the commandline options
     try:
-        opts, args = getopt.getopt(sys.argv[1:], 'o:p:t:haeqfimnvs',
-                                   ['mssql', 'mysql', 'output', 'mail', 'vnc', 'target', 'nikto', 'port', 'ftpanon',
-                                    'enum4linux', 'showmount', 'all', 'help'])
+        opts, args = getopt.getopt(sys.argv[1:], 'o:p:t:j:l:b:T:D:d:k:E:M:Q:I:r:y:L:H:U:G:x:w:W:haSPRFXABCN' +
+                                   ''.join(plugin.option[0] for plugin in registry),
+                                   [plugin.option[1] for plugin in registry] +
+                                   ['output', 'target', 'port', 'all', 'help', 'stream', 'jobs=',
+                                    'limits=', 'batch=', 'timeouts=', 'deadline=',
+                                    'plan', 'resume', 'diff=', 'shards=', 'emit-shards=', 'merge=',
+                                    'files', 'export', 'query=', 'interval=', 'rate=', 'adaptive',
+                                    'banners', 'classify', 'priority=', 'estimates=',
+                                    'host-failures=', 'no-recheck', 'serve=',
+                                    'target-file=', 'exclude=', 'web-batch=', 'maxtime='])
     except getopt.GetoptError as err:
         print(str(err))
         usage()
 
     # handle arguments
+    flags = dict(('-' + plugin.option[0], plugin.name) for plugin in registry)
+    flags.update(('--' + plugin.option[1], plugin.name) for plugin in registry)
     for o, a in opts:
         if o in ('-h', '--help'):
             usage()
@@ -378,73 +471,252 @@ def main():
             ports = a
         elif o in ('-a', '--all'):
             all_plugins = True
-        elif o in ('-e', '--enum4linux'):
-            enum4linux_plugin = True
-        elif o in ('-f', '--ftpanon'):
-            ftpanon_plugin = True
-        elif o in ('-v', '--vnc'):
-            vnc_plugin = True
-        elif o in ('-m', '--mail'):
-            smtpRelay_plugin = True
-        elif o in ('-s', '--showmount'):
-            showmount_plugin = True
-        elif o in ('-n', '--nikto'):
-            nikto_plugin = True
-        elif o in ('-q', '--mysql'):
-            mysql_plugin = True
-        elif o in ('-i', '--mssql'):
-            mssql_plugin = True
+        elif o in flags:
+            selected.add(flags[o])
         elif o in ('-o', '--output'):
             output = a
+        elif o in ('-S', '--stream'):
+            stream = True
+        elif o in ('-j', '--jobs'):
+            config.jobs = int(a)
+        elif o in ('-b', '--batch'):
+            config.batch_size = int(a)
+        elif o in ('-l', '--limits'):
+            try:
+                config.limits = parse_limits(a)
+            except ValueError as err:
+                print(str(err))
+                usage()
+        elif o in ('-T', '--timeouts'):
+            try:
+                config.timeouts = parse_limits(a)
+            except ValueError as err:
+                print(str(err))
+                usage()
+        elif o in ('-D', '--deadline'):
+            config.deadline = int(a)
+        elif o in ('-P', '--plan'):
+            plan_only = True
+        elif o in ('-R', '--resume'):
+            resume = True
+        elif o in ('-d', '--diff'):
+            diff = a
+        elif o in ('-k', '--shards'):
+            shards = int(a)
+        elif o in ('-E', '--emit-shards'):
+            emit_shards = int(a)
+        elif o in ('-M', '--merge'):
+            merge_files = [path for path in a.split(',') if path]
+        elif o in ('-F', '--files'):
+            files = True
+        elif o in ('-X', '--export'):
+            export = True
+        elif o in ('-Q', '--query'):
+            query = a
+        elif o in ('-I', '--interval'):
+            interval = float(a)
+        elif o in ('-r', '--rate'):
+            config.rate = int(a)
+        elif o in ('-A', '--adaptive'):
+            adaptive = True
+        elif o in ('-B', '--banners'):
+            banners = True
+        elif o in ('-C', '--classify'):
+            classify = True
+        elif o in ('-y', '--priority'):
+            try:
+                config.priorities = parse_priorities(a)
+            except ValueError as err:
+                print(str(err))
+                usage()
+        elif o in ('-L', '--estimates'):
+            config.estimates = a
+        elif o in ('-H', '--host-failures'):
+            config.host_failures = int(a)
+        elif o in ('-N', '--no-recheck'):
+            config.recheck = False
+        elif o in ('-U', '--serve'):
+            serve = a
+        elif o in ('-G', '--target-file'):
+            target_files += [path for path in a.split(',') if path]
+        elif o in ('-x', '--exclude'):
+            excludes += [item for item in a.split(',') if item]
+        elif o in ('-w', '--web-batch'):
+            config.web_batch = int(a)
+        elif o in ('-W', '--maxtime'):
+            config.maxtime = int(a)
         else:
             assert False, ('Unhandled option')
 
-    # if all ports selected, create all ports list
+    # daemon mode, scans come in over the socket instead of from -t and -p
+    if serve:
+        Daemon(serve, config).serve()
+        return
+
+    # work on the results store of an earlier run, output is its full name
+    if export or query:
+        if not os.path.exists(journal_path(output)):
+            print('No results store found at %s' % journal_path(output))
+            usage()
+        journal = Journal(output)
+        if query:
+            find(output, query)
+        if export:
+            written = export_files(output)
+            print('Wrote the per-port host lists and %d plugin results files for %s' % (len(written), output))
+        journal.close()
+        return
+
+    # if all ports selected, scan every port a plugin looks at
     if ports == 'all':
-        pList = []
-        for i in range(len(all_ports)):
-            for ii in range(len(all_ports[i])):
-                pList.append(str(all_ports[i][ii]))
-        ports = ','.join(pList)
-
-    # add timestamp and range to output
-    if '/' not in target:
-        target = target + '/32'
-    output = ('%s_%s_%s' % (output, time, ('%s-%s' % ((target.split('/')[0]), (target.split('/')[1])))))
-
-    # call masscan with options
-    masscan(ports, target, output)
-    cleanup(ports, target, output)
-
-    if all_plugins:
-        ftpanon(ports, target, output)
-        nikto(ports, target, output)
-        enum4linux(ports, target, output)
-        showmount(ports, target, output)
-        vncCheck(ports, target, output)
-        smtpRelay(ports, target, output)
-        mysql(ports, target, output)
-        mssql(ports, target, output)
-    else:
-        if ftpanon_plugin:
-            ftpanon(ports, target, output)
-        if nikto_plugin:
-            nikto(ports, target, output)
-        if enum4linux_plugin:
-            enum4linux(ports, target, output)
-        if showmount_plugin:
-            showmount(ports, target, output)
-        if vnc_plugin:
-            vncCheck(ports, target, output)
-        if smtpRelay_plugin:
-            smtpRelay(ports, target, output)
-        if mysql_plugin:
-            mysql(ports, target, output)
-        if mssql_plugin:
-            mssql(ports, target, output)
+        ports = ','.join(str(port) for port in all_ports())
 
-    print('Masscan results can be found in %s (with appended port results)' % (output))
+    # masscan gets the ports back as merged ranges
+    try:
+        ports = str(PortSpec(ports))
+    except ValueError as err:
+        print(str(err))
+        usage()
 
+    # bulk targets are merged into ranges, the output is named after the whole set
+    targets = None
+    if target_files or excludes or ',' in target or '-' in target:
+        try:
+            targets = TargetSet(target.split(','))
+            for path in target_files:
+                targets.load(path)
+            exclusions = TargetSet()
+            for item in excludes:
+                if os.path.isfile(item):
+                    exclusions.load(item)
+                else:
+                    exclusions.add(item)
+            targets = targets.subtract(exclusions)
+        except (IOError, ValueError) as err:
+            print(str(err))
+            usage()
+        if not targets:
+            print('Nothing left to scan once the exclusions are taken out')
+            usage()
+        print('Scanning %d addresses in %d ranges' % (targets.size(), targets.count()))
+        name = targets.name()
+    else:
+        # add timestamp and range to output
+        if '/' not in target:
+            target = target + '/32'
+        name = '%s-%s' % ((target.split('/')[0]), (target.split('/')[1]))
+    prefix = output
+    output = '%s_%s_%s' % (prefix, time, name)
+
+    # pick an interrupted run back up from its journal, or start a fresh one
+    if resume:
+        found = find_journal(prefix, name, output)
+        if found:
+            output = found
+            print('Resuming %s' % output)
+        else:
+            print('No journal found for %s, starting a new run' % output)
+            resume = False
+    if diff:
+        load_baseline(prefix, name, output if resume else None)
+        if previous == output:
+            if resume:
+                print('A run cannot be compared against itself, give -d an earlier run')
+                usage()
+            # an earlier run today has this run's name, the new one gets a numbered
+            # date stamp so the run it compares against is left as it was
+            run = 2
+            while previous == output:
+                output = '%s_%s.%d_%s' % (prefix, time, run, name)
+                run += 1
+    if not resume and os.path.exists(journal_path(output)):
+        os.remove(journal_path(output))
+    journal = Journal(output)
+    if targets is not None:
+        target = targets.masscan_target(output)
+
+    metrics = Metrics(os.path.basename(output))
+    metrics.begin('total')
+    if interval:
+        metrics.refresh(output, interval)
+
+    engine = Engine(config, output, selected_plugins(), job_finished, metrics.job_started)
+    controller = RateController(config.jobs, config.rate, on_change=engine.runner.set_concurrency)
+    if adaptive:
+        engine.runner.set_concurrency(controller.jobs)
+
+    # split the scan up for other boxes, they are merged back in with -M
+    if emit_shards:
+        paths = write_specs(shard_specs(ports, target, output, emit_shards,
+                                       rate=controller.masscan_rate(emit_shards), banners=banners), output)
+        print('Wrote %d masscan job specs:' % len(paths))
+        for path in paths:
+            print('    %s' % path)
+        print('Run each spec\'s command on its node, then merge the outputs with -M')
+        return
+
+    # stream results straight into the plugins, a dry run or a diff needs the full results first
+    if stream and not plan_only and not diff and shards < 2 and not merge_files and not banners and \
+            not classify and not journal.phase_done('masscan'):
+        pipeline(ports, target, output)
+        report(selected_plugins(), output)
+        print('Masscan results can be found in %s (with appended port results)' % (output))
+        return
+
+    # call masscan with options, unless a resumed run already has its results
+    if journal.phase_done('masscan'):
+        print('masscan already finished for %s' % output)
+    else:
+        with metrics.phase('masscan'):
+            if merge_files:
+                print('Merging %d masscan outputs into %s' % (len(merge_files), output))
+                merge_outputs(merge_files, output)
+            elif shards > 1:
+                masscan_sharded(ports, target, output, shards, controller.masscan_rate(shards), banners)
+            else:
+                masscan(ports, target, output, controller.masscan_rate(), banners)
+        journal.finish_phase('masscan')
+    if journal.phase_done('cleanup'):
+        buckets = journal.load_results()
+    else:
+        with metrics.phase('cleanup'):
+            buckets = cleanup(ports, target, output, files)
+            journal.save_results(buckets)
+        metrics.add('masscan_results', sum(len(hosts) for hosts in buckets.values()))
+        journal.finish_phase('cleanup')
+
+    # work out the unique plugin jobs before running any of them
+    if banners or classify:
+        services = classify_services(buckets, output)
+    with metrics.phase('plan'):
+        planned, duplicates = plan(buckets, plugin_table(selected_plugins()), route if services else None)
+    if skipped:
+        print('Skipped plugins on services they do not match: %s' % ', '.join(
+            '%s %d' % item for item in sorted(skipped.items())))
+    if plan_only:
+        tools = dict((name, plugins[name].tool) for name in selected_plugins())
+        for line in plan_summary(planned, duplicates, tools, set(n for n in tools if engine.batcher.handles(n)),
+                                 config.batch_size, engine.runner.jobs, config.limits, engine.estimates.costs()):
+            print(line)
+        save_metrics(output)
+        return
+
+    # jobs a previous attempt finished are skipped, pending and failed ones run again
+    done = journal.done_jobs()
+    remaining = [job for job in planned if job_id(plugin_key(*job)) not in done]
+    if len(remaining) < len(planned):
+        print('Skipping %d plugin jobs that already finished' % (len(planned) - len(remaining)))
+    if diff:
+        with metrics.phase('plan'):
+            remaining = differential(remaining, buckets, output)
+    journal.add_jobs(plugin_key(*job) for job in remaining)
+    metrics.begin('plugins')
+    run_plan(remaining, output)
+
+    report(selected_plugins(), output)
+    print('Masscan results can be found in %s (with appended port results)' % (output))
 
-main()
 
+if __name__ == '__main__':
+    print_progress()
+    main()
@@ -0,0 +1,19 @@
+# pyscanners - shared code for omnislash.py and massNikto.py
+# Author- David Sullivan
+#
+# pyscanners.api.scan() runs omnislash from other Python code.
+#
+# The modules report their progress (masscan starting, each plugin job, hosts
+# given up on) through logging, so a library caller only sees it once it sets
+# logging up. print_progress() is how omnislash.py and massNikto.py print it.
+
+import logging, sys
+
+
+def print_progress():
+    # progress and warnings from every pyscanners module go to stdout, one plain line each
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger('pyscanners')
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
@@ -0,0 +1,106 @@
+#! python3
+# api.py - omnislash as a library
+# Author- David Sullivan
+#
+# scan() runs masscan against a target and the selected plugins against what it
+# finds, the same way omnislash -S does, but yields every result as a Result
+# instead of writing files and printing a summary:
+#
+#   from pyscanners.api import Config, scan
+#   for result in scan('10.0.0.0/24', '21,80,445', ['ftpanon', 'nikto'], Config(jobs=8)):
+#       print(result.host, result.port, result.tool, result.finding)
+#
+# Open ports come first as they are found (tool 'masscan', finding 'open'), then
+# plugin findings as their jobs finish. Plugins without a parser give one result
+# holding their output (finding 'output'). Everything the run writes lives in a
+# scratch folder that is removed afterwards unless Config.workdir is given.
+# Stopping early (break) stops masscan and cancels the queued jobs.
+# route(plugin, address, port) can turn down plugin jobs, as the daemon does for
+# hosts no request wants them on. Setting stop (a threading.Event) from another
+# thread ends the scan where it is: masscan is stopped, queued jobs are dropped
+# and running ones killed, and the generator finishes. Jobs are handed out by the same
+# pyscanners.engine.Engine omnislash -S uses, Config comes from there as well.
+
+import collections, os, queue, shutil, tempfile, threading
+from pyscanners.engine import Config, Engine
+from pyscanners.masscan import masscan_stream
+from pyscanners.plugins import all_ports, plugins as registered, registry
+from pyscanners.portspec import PortSpec
+
+Result = collections.namedtuple('Result', 'host port tool finding detail')
+
+
+def job_results(job):
+    # Results for a finished job, nothing for one that timed out or was skipped
+    if job.status not in ('done', 'failed'):
+        return []
+    if job.findings:
+        results = []
+        for name, findings in sorted(job.findings.items()):
+            for address, port, finding, detail in findings:
+                results.append(Result(address, port if port is not None else job.info['port'], name, finding, detail))
+        return results
+    if 'plugin' in job.info:
+        return [Result(job.info['address'], job.info['port'], job.info['plugin'], 'output',
+                       job.output.decode('utf-8', 'replace'))]
+    return []
+
+
+def scan(target, ports, plugins=None, config=None, route=None, stop=None):
+    # generator of Results, ports is a port string (or 'all' for every plugin
+    # port) or a list of ports, plugins a list of plugin names (default all)
+    config = config or Config()
+    if ports == 'all':
+        ports = all_ports()
+    if not isinstance(ports, str):
+        ports = ','.join(str(port) for port in ports)
+    ports = str(PortSpec(ports))
+    names = [plugin.name for plugin in registry] if plugins is None else list(plugins)
+    for name in names:
+        if name not in registered:
+            raise ValueError('unknown plugin %r' % name)
+    names = [plugin.name for plugin in registry if plugin.name in names]
+
+    workdir = config.workdir or tempfile.mkdtemp(prefix='omnislash_')
+    output = os.path.join(workdir, 'scan')
+    finished = queue.Queue()
+    engine = Engine(config, output, names, finished.put)
+
+    def wanted(name, address, port, key):
+        return route is None or route(name, address, port)
+
+    def drained():
+        # wait for the runner in the background, None marks the end
+        engine.wait()
+        finished.put(None)
+
+    def watch():
+        # stop the engine once stop is set, until the scan is over
+        while not stop.wait(0.5):
+            if done.is_set():
+                return
+        engine.stop()
+
+    done = threading.Event()
+    if stop is not None:
+        threading.Thread(target=watch, daemon=True).start()
+    found = masscan_stream(ports, target, output, config.rate, stop)
+    try:
+        for address, port in found:
+            yield Result(address, port, 'masscan', 'open', '')
+            engine.queue(address, port, wanted)
+            while not finished.empty():
+                for result in job_results(finished.get()):
+                    yield result
+
+        engine.flush()
+        threading.Thread(target=drained, daemon=True).start()
+        for job in iter(finished.get, None):
+            for result in job_results(job):
+                yield result
+    finally:
+        done.set()
+        found.close()
+        engine.cancel()
+        if not config.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
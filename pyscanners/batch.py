@@ -0,0 +1,95 @@
+#! python3
+# batch.py - the host batching shared by the nmap and nikto engines
+# Author- David Sullivan
+#
+# A Batcher collects the hosts found on each port and hands a whole list of them
+# to one run of its tool, once batch_size are in or when flush() is called. The
+# host list is only written when the runner starts the batch, leaving out the
+# hosts pyscanners.health has found down by then, and the tool's report is
+# removed once it has been parsed. NSEBatcher (pyscanners.nse) and WebBatcher
+# (pyscanners.web) fill in the command, the list file's lines and the parsing.
+
+import collections, os
+
+
+class Batcher(object):
+    # names the batch's files, output_<port>_<kind><n> and its .xml report
+    kind = 'batch'
+
+    def __init__(self, runner, output, batch_size, outfile=None):
+        # outfile(port) names a file the tool's console output is appended to
+        # (None keeps it in the job only)
+        self.runner = runner
+        self.output = output
+        self.batch_size = max(1, batch_size)
+        self.outfile = outfile
+        self.hosts = collections.defaultdict(list)
+        self.seen = set()
+        self.batches = 0
+
+    def add(self, address, port, tls=False):
+        # streaming: collect hosts per port and start a batch once it is full
+        if (address, port) in self.seen:
+            return
+        self.seen.add((address, port))
+        self.hosts[port].append((address, tls))
+        if len(self.hosts[port]) >= self.batch_size:
+            self._submit(port, self.hosts.pop(port))
+
+    def flush(self):
+        # start whatever partial batches are left
+        for port in list(self.hosts):
+            self._submit(port, self.hosts.pop(port))
+
+    def _submit(self, port, targets):
+        names = self.names(port)
+        if not targets or not names:
+            return
+        self.batches += 1
+        listfile = '%s_%s_%s%d' % (self.output, port, self.kind, self.batches)
+        report = '%s.xml' % listfile
+
+        def start(job):
+            # the hosts that are still up when the batch gets to run
+            up = set(job.info['hosts'])
+            out = open(listfile, 'w')
+            for address, tls in targets:
+                if address in up:
+                    out.write(self.line(address, port, tls))
+            out.close()
+            job.message = 'Running %s against %d hosts on port %s' % (self.label(port), len(up), port)
+
+        def done(job):
+            try:
+                self.parse(job, port, report)
+            finally:
+                for path in (report, listfile):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        self.runner.submit(self.command(port, listfile, report), self.outfile(port) if self.outfile else None,
+                           None, done, start, port=port, hosts=[address for address, tls in targets],
+                           plugins=names, timeout=self.timeout(len(targets)))
+
+    def names(self, port):
+        # the plugins a batch on this port runs for, none and there is no batch
+        raise NotImplementedError
+
+    def line(self, address, port, tls):
+        # one host's line in the list file
+        return '%s\n' % address
+
+    def label(self, port):
+        # what the batch runs, for its message
+        raise NotImplementedError
+
+    def command(self, port, listfile, report):
+        raise NotImplementedError
+
+    def parse(self, job, port, report):
+        # the finished job's results, findings and host states from its report
+        raise NotImplementedError
+
+    def timeout(self, count):
+        # seconds a batch of count hosts may run for, None leaves it to the tool's timeout
+        return None
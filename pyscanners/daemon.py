@@ -0,0 +1,255 @@
+#! python3
+# daemon.py - omnislash as a long running service on a Unix socket
+# Author- David Sullivan
+#
+# omnislash -U /run/omnislash.sock stays up and takes scan requests on the socket,
+# so hundreds of small scans a day no longer each pay for a fresh interpreter,
+# imports and option parsing. Every connection sends one JSON object on a line and
+# gets one JSON object back:
+#
+#   {"op": "scan", "target": "10.0.0.0/24", "ports": "21,80", "plugins": ["nikto"], "every": 3600}
+#       -> {"id": 1}, plugins and every (seconds between recurring runs) are optional
+#   {"op": "status"}                    -> {"requests": [...]}, one entry per request
+#   {"op": "results", "id": 1, "since": 0}
+#                                       -> {"state": ..., "results": [...]}, the latest run's
+#                                          results from index since on, for polling
+#   {"op": "cancel", "id": 1}           -> {"state": "cancelled"}
+#   {"op": "shutdown"}                  -> {"state": "stopping"}
+#
+# Requests that are due together and ask for the same ports are coalesced: their
+# targets are merged into one masscan run and a plugin job on a host that several
+# requests cover only runs once. Requests on different ports get a masscan run
+# each, so no target is ever scanned on ports nobody asked for it. Each request
+# then gets the results inside its own targets, ports and plugins. Cancelling
+# every request of a running scan, or shutting down, stops the scan where it is.
+# request() is a small client for the same protocol.
+
+import collections, ipaddress, json, logging, os, socket, socketserver, threading, time
+from pyscanners.api import Config, scan
+from pyscanners.plugins import plugins as registered
+from pyscanners.portspec import PortSpec
+
+log = logging.getLogger(__name__)
+
+
+class Request(object):
+    def __init__(self, number, target, ports, plugins=None, every=None):
+        # target is a comma separated list of addresses and networks
+        self.number = number
+        self.target = target
+        self.networks = [ipaddress.ip_network(item.strip(), strict=False) for item in target.split(',')
+                         if item.strip()]
+        if not self.networks:
+            raise ValueError('no target given')
+        self.spec = PortSpec(ports)
+        self.plugins = plugins
+        for name in plugins or []:
+            if name not in registered:
+                raise ValueError('unknown plugin %r' % name)
+        self.every = every
+        # queued, running, done, failed or cancelled
+        self.state = 'queued'
+        self.cancelled = False
+        self.due = time.time()
+        self.runs = 0
+        self.results = []
+        self.error = None
+
+    def wants(self, address, port, tool):
+        # a result is this request's when it falls inside its targets, ports and plugins
+        if port not in self.spec:
+            return False
+        if tool != 'masscan' and self.plugins is not None and tool not in self.plugins:
+            return False
+        host = ipaddress.ip_address(address)
+        return any(host in network for network in self.networks)
+
+    def status(self):
+        return {'id': self.number, 'target': self.target, 'ports': str(self.spec), 'plugins': self.plugins,
+                'every': self.every, 'state': self.state, 'runs': self.runs, 'results': len(self.results),
+                'next_run': self.due if self.state == 'queued' else None, 'error': self.error}
+
+
+class Daemon(object):
+    def __init__(self, path, config=None):
+        # config is the pyscanners.api.Config every scan runs with
+        self.path = path
+        self.config = config or Config()
+        self.requests = {}
+        self.count = 0
+        self.stopping = False
+        self.condition = threading.Condition()
+        self.server = None
+        # the requests of the scan that is running and the event that stops it
+        self.current = []
+        self.stop = None
+
+    def handle(self, message):
+        # one request from the socket -> the reply
+        if not isinstance(message, dict):
+            raise ValueError('expected a JSON object, got %r' % (message,))
+        op = message.get('op')
+        with self.condition:
+            if op == 'scan':
+                self.count += 1
+                request = Request(self.count, message['target'], str(message['ports']), message.get('plugins'),
+                                  message.get('every'))
+                self.requests[request.number] = request
+                self.condition.notify_all()
+                return {'id': request.number}
+            if op == 'status':
+                return {'requests': [request.status() for number, request in sorted(self.requests.items())]}
+            if op in ('results', 'cancel'):
+                request = self.requests.get(message.get('id'))
+                if request is None:
+                    raise ValueError('no request %r' % message.get('id'))
+                if op == 'cancel':
+                    # a running scan is stopped once none of the requests it was for is left
+                    request.every = None
+                    if request.state == 'queued':
+                        request.state = 'cancelled'
+                    elif request.state == 'running':
+                        request.cancelled = True
+                        if request in self.current and all(other.cancelled for other in self.current):
+                            self.stop.set()
+                    return {'state': request.state}
+                return {'state': request.state, 'runs': request.runs,
+                        'results': request.results[int(message.get('since', 0)):]}
+            if op == 'shutdown':
+                self.stopping = True
+                if self.stop is not None:
+                    self.stop.set()
+                self.condition.notify_all()
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return {'state': 'stopping'}
+        raise ValueError('unknown op %r' % op)
+
+    def due(self):
+        # queued requests whose time has come, called with the lock held
+        now = time.time()
+        return [request for request in self.requests.values() if request.state == 'queued' and request.due <= now]
+
+    def wait(self):
+        # block until something is due (or the daemon stops), returns the batch
+        with self.condition:
+            while not self.stopping:
+                batch = self.due()
+                if batch:
+                    for request in batch:
+                        request.state = 'running'
+                        request.results = []
+                    return batch
+                waiting = [request.due for request in self.requests.values() if request.state == 'queued']
+                self.condition.wait(max(0.1, min(waiting) - time.time()) if waiting else None)
+        return []
+
+    def run_batch(self, batch):
+        # one scan per distinct port spec, over the merged targets of its requests
+        groups = collections.OrderedDict()
+        for request in batch:
+            groups.setdefault(str(request.spec), []).append(request)
+        for ports, group in groups.items():
+            self.run_group(ports, group)
+
+    def run_group(self, ports, batch):
+        # one masscan over the merged targets, one plugin job per host that any request wants
+        networks = ipaddress.collapse_addresses(network for request in batch for network in request.networks
+                                                if network.version == 4)
+        targets = [str(network) for network in networks]
+        targets += sorted(set(str(network) for request in batch for network in request.networks
+                              if network.version == 6))
+        if any(request.plugins is None for request in batch):
+            plugins = None
+        else:
+            plugins = sorted(set(name for request in batch for name in request.plugins))
+        log.info('Running request%s %s against %s', 's' if len(batch) > 1 else '',
+                 ','.join(str(request.number) for request in batch), ','.join(targets))
+
+        def route(name, address, port):
+            return any(request.wants(address, port, name) for request in batch)
+
+        with self.condition:
+            if self.stopping:
+                for request in batch:
+                    request.state = 'cancelled'
+                return
+            self.current = batch
+            self.stop = threading.Event()
+            stop = self.stop
+
+        error = None
+        try:
+            for result in scan(','.join(targets), ports, plugins, self.config, route, stop):
+                with self.condition:
+                    for request in batch:
+                        if request.wants(result.host, result.port, result.tool):
+                            request.results.append(result._asdict())
+        except Exception as err:
+            error = str(err)
+            log.warning('Scan of %s failed: %s', ','.join(targets), err)
+
+        with self.condition:
+            self.current = []
+            self.stop = None
+            for request in batch:
+                request.runs += 1
+                request.error = error
+                if request.cancelled or (stop.is_set() and self.stopping):
+                    request.state = 'cancelled'
+                elif request.every and not self.stopping:
+                    request.state = 'queued'
+                    request.due = time.time() + float(request.every)
+                else:
+                    request.state = 'failed' if error else 'done'
+
+    def engine(self):
+        while True:
+            batch = self.wait()
+            if not batch:
+                return
+            self.run_batch(batch)
+
+    def serve(self):
+        # listen until a shutdown request, scans run one batch at a time in the background
+        if os.path.exists(self.path):
+            try:
+                request(self.path, {'op': 'status'})
+                raise IOError('an omnislash daemon is already listening on %s' % self.path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                os.remove(self.path)
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                try:
+                    reply = daemon.handle(json.loads(self.rfile.readline().decode()))
+                except (ValueError, KeyError, TypeError) as err:
+                    reply = {'error': str(err)}
+                self.wfile.write((json.dumps(reply) + '\n').encode())
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        self.server.daemon_threads = True
+        engine = threading.Thread(target=self.engine)
+        engine.start()
+        log.info('Listening for scan requests on %s', self.path)
+        try:
+            self.server.serve_forever()
+        finally:
+            with self.condition:
+                self.stopping = True
+                self.condition.notify_all()
+            engine.join()
+            self.server.server_close()
+            os.remove(self.path)
+
+
+def request(path, message):
+    # send one request to a daemon and return its reply
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+        client.sendall((json.dumps(message) + '\n').encode())
+        reply = client.makefile('rb').readline()
+    finally:
+        client.close()
+    return json.loads(reply.decode())
@@ -0,0 +1,78 @@
+#! python3
+# diff.py - differential scanning against a previous run
+# Author- David Sullivan
+#
+# Compares this run's (ip, port) results with an earlier run of the same range so
+# plugins only need to run against new services. Services that were already open
+# last time can reuse the output their plugins produced then, taken from the
+# earlier run's journal, together with the findings that were parsed from it.
+
+import json, os
+from pyscanners.journal import Journal, journal_path, run_outputs
+from pyscanners.parser import ip_key, parse_file
+
+
+def find_previous(prefix, name, exclude=None):
+    # newest run of the same prefix and range, that includes an earlier run today
+    # under this very name, exclude is a run being resumed
+    found = [output for output in run_outputs(prefix, name) if output != exclude]
+    return found[-1] if found else None
+
+
+def result_pairs(buckets):
+    # port -> addresses buckets to a set of (address, port)
+    pairs = set()
+    for port, addresses in buckets.items():
+        for address in addresses:
+            pairs.add((address, port))
+    return pairs
+
+
+def load_previous(previous):
+    # results, cached plugin output and findings of an earlier run, from its journal
+    # when it has one, otherwise just the results from its raw masscan output
+    if os.path.exists(journal_path(previous)):
+        journal = Journal(previous)
+        buckets = journal.load_results()
+        outputs = journal.job_outputs()
+        findings = journal.host_findings()
+        journal.close()
+    elif os.path.exists(previous):
+        buckets = parse_file(previous)
+        outputs = {}
+        findings = {}
+    else:
+        raise IOError('no results found for %s' % previous)
+    return result_pairs(buckets), outputs, findings
+
+
+def job_findings(findings, name, address, port):
+    # the findings a reused job had, port is None for a job that ignores the port
+    return [finding for finding in findings.get((name, address), []) if port is None or finding[1] == port]
+
+
+def compare(current, previous):
+    # returns the (new, closed, unchanged) sets of (address, port)
+    return current - previous, previous - current, current & previous
+
+
+def unchanged_job(address, port, dependent, plugin_ports, current, previous):
+    # a port specific job is unchanged when its service was open last time, a job
+    # that ignores the port is unchanged when the host has the same ports open
+    if dependent:
+        return (address, port) in previous
+    before = set(p for p in plugin_ports if (address, p) in previous)
+    after = set(p for p in plugin_ports if (address, p) in current)
+    return before == after
+
+
+def save_report(path, previous, new, closed, unchanged):
+    def ordered(pairs):
+        return [[address, port] for address, port in sorted(pairs, key=lambda pair: (ip_key(pair[0]), pair[1]))]
+
+    report = {'previous': previous,
+              'counts': {'new': len(new), 'closed': len(closed), 'unchanged': len(unchanged)},
+              'new': ordered(new), 'closed': ordered(closed), 'unchanged': ordered(unchanged)}
+    out = open(path, 'w')
+    json.dump(report, out, indent=2)
+    out.close()
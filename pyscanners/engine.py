@@ -0,0 +1,113 @@
+#! python3
+# engine.py - the plugin engine shared by omnislash.py and pyscanners.api
+# Author- David Sullivan
+#
+# A Config holds the options a scan runs with (the omnislash command line options
+# of the same names). An Engine builds what the plugins run on from it: the runner
+# and its scheduler, the learned runtimes, the host health checks and the nmap and
+# nikto batchers. dispatch() sends one plugin job to whichever of them runs it and
+# queue() does that for every plugin a new masscan result is for, so the command
+# line and the library hand out their jobs the same way.
+
+from pyscanners.health import HostHealth
+from pyscanners.nse import NSEBatcher
+from pyscanners.planner import job_key
+from pyscanners.plugins import plugins
+from pyscanners.runner import Runner
+from pyscanners.scheduler import Estimates, Scheduler, parse_priorities
+from pyscanners.web import WebBatcher
+
+
+class Config(object):
+    def __init__(self, jobs=1, limits=None, timeouts=None, deadline=None, batch_size=256, rate=None,
+                 priorities=None, estimates=None, host_failures=3, recheck=True, workdir=None, web_batch=16,
+                 maxtime=None):
+        # the omnislash command line options of the same names: limits and timeouts
+        # are {tool: n}, priorities a -y string (or what parse_priorities() makes of
+        # one), estimates the learned runtimes file (None learns nothing), workdir
+        # keeps the scan's files in that folder, web_batch and maxtime are -w and -W
+        self.jobs = jobs
+        self.limits = limits or {}
+        self.timeouts = timeouts or {}
+        self.deadline = deadline
+        self.batch_size = batch_size
+        self.rate = rate
+        self.priorities = priorities
+        self.estimates = estimates
+        self.host_failures = host_failures
+        self.recheck = recheck
+        self.workdir = workdir
+        self.web_batch = web_batch
+        self.maxtime = maxtime
+
+
+class Engine(object):
+    def __init__(self, config, output, names, on_finish=None, on_start=None):
+        # names are the selected plugins, on_finish and on_start are the runner hooks,
+        # on_finish is called once the learned runtimes and host health have seen the job
+        self.config = config
+        self.on_finish = on_finish
+        self.estimates = Estimates(config.estimates)
+        self.health = HostHealth(config.host_failures, config.recheck)
+        priorities = config.priorities
+        if isinstance(priorities, str):
+            priorities = parse_priorities(priorities)
+        self.runner = Runner(config.jobs, config.limits, config.timeouts, config.deadline, self.finished, on_start,
+                             Scheduler(self.estimates, priorities), self.health.skip)
+        self.batcher = NSEBatcher(self.runner, output, dict(
+            (name, plugins[name]) for name in names if plugins[name].scripts), config.batch_size)
+        self.web = WebBatcher(self.runner, output, next((plugins[name] for name in names if plugins[name].batch),
+                                                        None), config.web_batch, config.maxtime)
+        self.names = list(names)
+        self.queued = set()
+
+    def finished(self, job):
+        self.estimates.observe(job)
+        self.health.observe(job)
+        if self.on_finish:
+            self.on_finish(job)
+
+    def dispatch(self, name, address, port, tls=False):
+        # queue a single plugin run against a single host, nmap and web plugins go into batches
+        if self.batcher.handles(name):
+            self.batcher.add(address, port)
+            return
+        if self.web.handles(name):
+            self.web.add(address, port, tls)
+            return
+        plugin = plugins[name]
+        self.runner.submit(plugin.command % {'address': address, 'port': port}, None,
+                           'Running %s against %s:%s' % (plugin.label, address, port),
+                           plugin=name, address=address, port=port)
+
+    def queue(self, address, port, wanted=None):
+        # streaming: dispatch every selected plugin that looks at this port, once per
+        # job key, wanted(name, address, port, key) can turn a job down
+        for name in self.names:
+            plugin = plugins[name]
+            if port not in plugin.ports:
+                continue
+            key = job_key(name, plugin.command, address, port)
+            if key in self.queued or (wanted and not wanted(name, address, port, key)):
+                continue
+            self.queued.add(key)
+            self.dispatch(name, address, port)
+
+    def flush(self):
+        # start the partial batches, no more results are coming
+        self.batcher.flush()
+        self.web.flush()
+
+    def wait(self):
+        # block until every queued job has finished
+        self.runner.wait()
+        self.estimates.save()
+
+    def cancel(self):
+        # drop the jobs that have not started and wait for the running ones
+        self.runner.cancel()
+        self.estimates.save()
+
+    def stop(self):
+        # drop the queued jobs and kill the running ones, from any thread
+        self.runner.stop()
@@ -0,0 +1,41 @@
+#! python3
+# findings.py - structured findings from nmap (-oX) and nikto (-Format xml) output
+# Author- David Sullivan
+#
+# Each parser returns a list of (address, port, finding, detail) tuples, which the
+# results store indexes so questions like "which hosts allow anonymous FTP" are
+# answered without re-reading the raw tool logs.
+
+import xml.etree.ElementTree as ElementTree
+
+
+def nmap_findings(xmlfile):
+    # one finding per NSE script result, named after the script
+    findings = []
+    root = ElementTree.parse(xmlfile).getroot()
+    for host in root.iter('host'):
+        address = host.find('address').get('addr')
+        for portElement in host.iter('port'):
+            port = int(portElement.get('portid'))
+            for script in portElement.findall('script'):
+                findings.append((address, port, script.get('id'), (script.get('output') or '').strip()))
+        for script in host.findall('hostscript/script'):
+            findings.append((address, None, script.get('id'), (script.get('output') or '').strip()))
+    return findings
+
+
+def nikto_findings(xmlfile):
+    # one finding per reported item, named nikto-<item id>
+    findings = []
+    root = ElementTree.parse(xmlfile).getroot()
+    for details in root.iter('scandetails'):
+        address = details.get('targetip') or details.get('targethostname')
+        port = details.get('targetport')
+        port = int(port) if port and port.isdigit() else None
+        for item in details.iter('item'):
+            description = (item.findtext('description') or '').strip()
+            uri = (item.findtext('uri') or '').strip()
+            detail = '%s %s' % (uri, description) if uri else description
+            findings.append((address, port, 'nikto-%s' % item.get('id'), detail))
+    return findings
+
@@ -0,0 +1,105 @@
+#! python3
+# health.py - stops plugins wasting their timeouts on hosts that have gone away
+# Author- David Sullivan
+#
+# A host that answered masscan can be gone by the time the plugins get to it, and
+# then every plugin on every port sits out its full timeout against it. HostHealth
+# counts the jobs against each host that timed out or could not reach it. Once a
+# host has failed threshold jobs in a row it is probed once, with a plain TCP
+# connect to the port the last job used. If that gets no answer either, the host
+# is marked down and the runner skips the rest of its jobs (status 'down', listed
+# in output_timeouts.json so they can be run later). Any job that gets through
+# resets the count.
+#
+# Batches (nmap NSE runs, nikto host lists) count for each of their hosts, from
+# the state their report gives it, and a down host is taken out of a batch's
+# host list before the batch starts.
+
+import logging, socket, threading
+
+log = logging.getLogger(__name__)
+
+# output that means the host could not be reached at all, a refused connection
+# still means something is there. pyscanners.ratecontrol counts these as errors too
+unreachable_patterns = [b'No route to host', b'Host is unreachable', b'Network is unreachable', b'Host seems down',
+                        b'Connection timed out']
+down_patterns = unreachable_patterns + [b'0 host(s) tested']
+
+# seconds a probe waits for a connection, the re-check here and pyscanners.services'
+probe_timeout = 3.0
+
+
+def reachable(address, port, timeout=probe_timeout):
+    # a refused connection counts, it came from the host
+    try:
+        socket.create_connection((address, port), timeout).close()
+    except ConnectionRefusedError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+class HostHealth(object):
+    def __init__(self, threshold=3, recheck=True):
+        # threshold is the failures in a row that take a host down, 0 turns
+        # tracking off, recheck probes a host once before it is given up on
+        self.threshold = threshold
+        self.recheck = recheck
+        self.failures = {}
+        self.rechecked = set()
+        self.down = set()
+        self.lock = threading.Lock()
+
+    def failed(self, job):
+        if job.status == 'timeout':
+            return True
+        return any(pattern in job.output for pattern in down_patterns)
+
+    def skip(self, job):
+        # runner hook, the reason not to start a job or None to run it. The down
+        # hosts of a batch are moved from info['hosts'] to info['down'], the batch is
+        # only skipped when none are left
+        if not self.threshold:
+            return None
+        with self.lock:
+            if 'hosts' not in job.info:
+                return 'down' if job.info.get('address') in self.down else None
+            hosts = [address for address in job.info['hosts'] if address not in self.down]
+            if not hosts:
+                return 'down'
+            if len(hosts) < len(job.info['hosts']):
+                job.info['down'] = [address for address in job.info['hosts'] if address in self.down]
+                job.info['hosts'] = hosts
+        return None
+
+    def observe(self, job):
+        # runner hook, a batch counts for each host its report gave a state, a batch
+        # that was stopped before its report was complete only for the hosts it got to
+        if not self.threshold or job.status in ('deadline', 'down', 'cancelled'):
+            return
+        if 'hosts' in job.info:
+            for address, state in sorted(job.states.items()):
+                self.host_result(address, job.info.get('port'), state == 'down')
+        elif job.info.get('address') is not None:
+            self.host_result(job.info['address'], job.info.get('port'), self.failed(job))
+
+    def host_result(self, address, port, failed):
+        with self.lock:
+            if not failed:
+                self.failures.pop(address, None)
+                return
+            self.failures[address] = self.failures.get(address, 0) + 1
+            if self.failures[address] < self.threshold or address in self.down:
+                return
+            probe = self.recheck and address not in self.rechecked and port is not None
+            self.rechecked.add(address)
+
+        # the probe runs outside the lock, it can take a few seconds
+        if probe and reachable(address, port):
+            with self.lock:
+                self.failures.pop(address, None)
+            return
+        with self.lock:
+            self.down.add(address)
+        log.info('%s failed %d jobs in a row, skipping the rest of its jobs', address, self.threshold)
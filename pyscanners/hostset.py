@@ -0,0 +1,151 @@
+#! python3
+# hostset.py - compact, sorted sets of IP addresses
+# Author- David Sullivan
+#
+# HostSet keeps IPv4 addresses as packed 32-bit integers in an array('I') instead
+# of a Python string each, which is about 4 bytes an address instead of ~100 once
+# the set overhead is counted. New addresses collect in a pending set that is
+# merged into the sorted, deduplicated array in bulk, so adds, membership tests
+# and the final numerical sort stay cheap at /8 scale. IPv6 addresses go through ipaddress.
+#
+# NumPy is used for the merges when it is installed, but is not required.
+
+import array, bisect, ipaddress, itertools, operator, socket, struct
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# unsigned 32-bit array typecode on this platform
+TYPECODE = 'I' if array.array('I').itemsize == 4 else 'L'
+
+# pending addresses are merged once there are this many, or half the array's size
+MERGE_MIN = 65536
+
+ipv4 = struct.Struct('!I')
+
+
+def pack_ipv4(address):
+    # full dotted quad -> integer, ValueError for anything else. inet_pton rather
+    # than inet_aton, which takes shorthand like '10.0.0' (or a masscan line cut
+    # short to '10.0') for a whole address
+    try:
+        return ipv4.unpack(socket.inet_pton(socket.AF_INET, address))[0]
+    except OSError:
+        raise ValueError('bad IPv4 address %r' % address)
+
+
+def pack(address):
+    # address -> (version, integer), which is also its numerical sort key
+    try:
+        return 4, pack_ipv4(address)
+    except ValueError:
+        return 6, int(ipaddress.IPv6Address(address))
+
+
+def unpack(version, value):
+    if version == 4:
+        return socket.inet_ntoa(ipv4.pack(value))
+    return str(ipaddress.IPv6Address(value))
+
+
+class HostSet(object):
+    def __init__(self, addresses=()):
+        self._v4 = array.array(TYPECODE)
+        self._pending = set()
+        self._v6 = set()
+        self._limit = MERGE_MIN
+        self.update(addresses)
+
+    def add(self, address):
+        # duplicates are dropped when the pending addresses are merged
+        try:
+            value = pack_ipv4(address)
+        except ValueError:
+            self._v6.add(int(ipaddress.IPv6Address(address)))
+            return
+        self._pending.add(value)
+        if len(self._pending) >= self._limit:
+            self._merge()
+
+    def add_packed(self, value):
+        # an IPv4 address that is already a 32-bit integer, e.g. from masscan -oB
+        self._pending.add(value)
+        if len(self._pending) >= self._limit:
+            self._merge()
+
+    def merge(self, other):
+        # fold in another HostSet, e.g. one built from a different chunk of the same file
+        self._merge()
+        self._union(array.array(TYPECODE, other.packed()))
+        self._v6.update(other._v6)
+        self._limit = max(MERGE_MIN, len(self._v4) // 2)
+
+    def add_new(self, address):
+        # like add(), but returns True only when the address was not in the set yet
+        if address in self:
+            return False
+        self.add(address)
+        return True
+
+    def update(self, addresses):
+        for address in addresses:
+            self.add(address)
+
+    def __contains__(self, address):
+        try:
+            version, value = pack(address)
+        except ValueError:
+            return False
+        if version == 6:
+            return value in self._v6
+        return value in self._pending or self._in_array(value)
+
+    def __len__(self):
+        self._merge()
+        return len(self._v4) + len(self._v6)
+
+    def __bool__(self):
+        return bool(self._v4) or bool(self._pending) or bool(self._v6)
+
+    def __iter__(self):
+        # addresses in numerical order, IPv4 first
+        self._merge()
+        for value in self._v4:
+            yield unpack(4, value)
+        for value in sorted(self._v6):
+            yield unpack(6, value)
+
+    def packed(self):
+        # the sorted IPv4 array itself, for callers that work on integers
+        self._merge()
+        return self._v4
+
+    def _in_array(self, value):
+        i = bisect.bisect_left(self._v4, value)
+        return i < len(self._v4) and self._v4[i] == value
+
+    def _merge(self):
+        if not self._pending:
+            return
+        self._union(array.array(TYPECODE, sorted(self._pending)))
+        self._pending = set()
+        self._limit = max(MERGE_MIN, len(self._v4) // 2)
+
+    def _union(self, pending):
+        # pending is sorted without repeats
+        if not pending:
+            return
+        if numpy is not None and self._v4:
+            merged = numpy.union1d(numpy.frombuffer(self._v4, dtype=numpy.uint32),
+                                   numpy.frombuffer(pending, dtype=numpy.uint32))
+            self._v4 = array.array(TYPECODE, merged.astype(numpy.uint32).tobytes())
+        elif self._v4:
+            # two sorted runs without repeats of their own, which Python's sort merges in
+            # linear time, so any duplicate sits right next to its twin
+            merged = sorted(self._v4 + pending)
+            self._v4 = array.array(TYPECODE, merged[:1])
+            self._v4.extend(itertools.compress(merged[1:], map(operator.ne, merged[1:], merged)))
+        else:
+            self._v4 = pending
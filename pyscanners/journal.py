@@ -0,0 +1,192 @@
+#! python3
+# journal.py - SQLite results store and checkpoint journal
+# Author- David Sullivan
+#
+# Kept next to the output files as output.sqlite. It records which phases of the
+# run have finished, the parsed masscan results and the state of every plugin
+# job, so an interrupted run can pick up where it stopped instead of running
+# masscan and every plugin again.
+#
+# Each finished job also keeps its captured output, which lets a differential
+# run reuse it for services that have not changed since, and the findings parsed
+# from nmap's and nikto's XML are indexed so they can be queried directly. The
+# per-port and per-tool text files can be exported from it whenever needed.
+
+import glob, os, re, sqlite3, threading, time
+from pyscanners.hostset import HostSet, pack
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS phases (name TEXT PRIMARY KEY, finished REAL);
+CREATE TABLE IF NOT EXISTS results (address TEXT, port INTEGER, proto TEXT, PRIMARY KEY (address, port, proto));
+CREATE TABLE IF NOT EXISTS jobs (key TEXT PRIMARY KEY, plugin TEXT, address TEXT, port INTEGER, state TEXT,
+                                 elapsed REAL, updated REAL, output BLOB);
+CREATE TABLE IF NOT EXISTS findings (plugin TEXT, address TEXT, port INTEGER, finding TEXT, detail TEXT,
+                                     PRIMARY KEY (plugin, address, port, finding, detail));
+CREATE TABLE IF NOT EXISTS services (address TEXT, port INTEGER, service TEXT, banner TEXT,
+                                     PRIMARY KEY (address, port));
+CREATE INDEX IF NOT EXISTS findings_by_name ON findings (finding);
+CREATE INDEX IF NOT EXISTS results_by_port ON results (port);
+'''
+
+
+# the date in <prefix>_<date>_<range> output names, .n numbers a later run that day
+STAMP = re.compile(r'\d{4}-\d{2}-\d{2}(\.\d+)?')
+
+
+def journal_path(output):
+    return '%s.sqlite' % output
+
+
+def run_outputs(prefix, name):
+    # output names of every run of <prefix>_<date>_<name> that has a journal, oldest
+    # first, only the date may differ so other prefixes and ranges never match
+    pattern = journal_path('%s_*_%s' % (glob.escape(prefix), glob.escape(name)))
+    found = []
+    for path in glob.glob(pattern):
+        if STAMP.fullmatch(path[len(prefix) + 1:-len('_%s.sqlite' % name)]):
+            found.append(path[:-len('.sqlite')])
+    return sorted(found, key=lambda output: os.path.getmtime(journal_path(output)))
+
+
+def find_journal(prefix, name, output):
+    # the run -R picks up: this one if its plugins have not finished, otherwise the
+    # newest unfinished run of the same prefix and range, a finished run is never resumed
+    unfinished = []
+    for found in run_outputs(prefix, name):
+        journal = Journal(found)
+        if not journal.phase_done('plugins'):
+            unfinished.append(found)
+        journal.close()
+    if output in unfinished:
+        return output
+    return unfinished[-1] if unfinished else None
+
+
+def job_id(key):
+    # (plugin, address, port or None) -> text primary key
+    return '%s|%s|%s' % (key[0], key[1], '' if key[2] is None else key[2])
+
+
+class Journal(object):
+    def __init__(self, output):
+        self.path = journal_path(output)
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        # journals written before job output was kept
+        columns = [row[1] for row in self.db.execute('PRAGMA table_info(jobs)')]
+        if 'output' not in columns:
+            self.db.execute('ALTER TABLE jobs ADD COLUMN output BLOB')
+        self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def phase_done(self, name):
+        with self.lock:
+            return self.db.execute('SELECT 1 FROM phases WHERE name = ?', (name,)).fetchone() is not None
+
+    def finish_phase(self, name):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO phases VALUES (?, ?)', (name, time.time()))
+            self.db.commit()
+
+    def save_results(self, buckets, proto='tcp'):
+        # buckets maps port -> addresses, as returned by cleanup()
+        with self.lock:
+            self.db.execute('DELETE FROM results')
+            for port, addresses in buckets.items():
+                self.db.executemany('INSERT OR IGNORE INTO results VALUES (?, ?, ?)',
+                                    ((address, port, proto) for address in addresses))
+            self.db.commit()
+
+    def load_results(self):
+        buckets = {}
+        with self.lock:
+            for address, port in self.db.execute('SELECT address, port FROM results'):
+                if port not in buckets:
+                    buckets[port] = HostSet()
+                buckets[port].add(address)
+        return buckets
+
+    def save_services(self, services):
+        # services maps (address, port) -> (tag, banner) as returned by pyscanners.services
+        with self.lock:
+            self.db.execute('DELETE FROM services')
+            self.db.executemany('INSERT OR REPLACE INTO services VALUES (?, ?, ?, ?)',
+                                ((address, port, tag, text) for (address, port), (tag, text) in services.items()))
+            self.db.commit()
+
+    def load_services(self):
+        with self.lock:
+            rows = self.db.execute('SELECT address, port, service, banner FROM services').fetchall()
+        return dict(((address, port), (tag, text)) for address, port, tag, text in rows)
+
+    def done_jobs(self):
+        # keys of every job that already finished cleanly
+        with self.lock:
+            rows = self.db.execute("SELECT key FROM jobs WHERE state = 'done'").fetchall()
+        return set(row[0] for row in rows)
+
+    def add_jobs(self, keys):
+        # plan jobs as pending, finished jobs keep their state
+        with self.lock:
+            self.db.executemany("INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, 'pending', 0, ?, NULL)",
+                                ((job_id(key), key[0], key[1], key[2], time.time()) for key in keys))
+            self.db.commit()
+
+    def set_job(self, key, state, elapsed=0.0, output=None):
+        with self.lock:
+            self.db.execute('INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                            (job_id(key), key[0], key[1], key[2], state, elapsed, time.time(), output))
+            self.db.commit()
+
+    def job_outputs(self):
+        # job id -> captured output of every job that finished cleanly
+        with self.lock:
+            rows = self.db.execute("SELECT key, output FROM jobs WHERE state = 'done' AND output IS NOT NULL")
+            return dict((key, bytes(output)) for key, output in rows)
+
+    def job_rows(self):
+        # (plugin, address, port, output) of every finished job, for exporting text files
+        with self.lock:
+            rows = self.db.execute("SELECT plugin, address, port, output FROM jobs "
+                                   "WHERE state = 'done' AND output IS NOT NULL").fetchall()
+        return [(plugin, address, port, bytes(output)) for plugin, address, port, output in rows]
+
+    def add_findings(self, plugin, findings):
+        # findings are (address, port, finding, detail) tuples from pyscanners.findings
+        with self.lock:
+            self.db.executemany('INSERT OR IGNORE INTO findings VALUES (?, ?, ?, ?, ?)',
+                                ((plugin,) + tuple(finding) for finding in findings))
+            self.db.commit()
+
+    def host_findings(self):
+        # (plugin, address) -> that plugin's findings on the host, for reusing them
+        # along with the job output in a differential run
+        with self.lock:
+            rows = self.db.execute('SELECT plugin, address, port, finding, detail FROM findings').fetchall()
+        found = {}
+        for plugin, address, port, finding, detail in rows:
+            found.setdefault((plugin, address), []).append((address, port, finding, detail))
+        return found
+
+    def find(self, finding, text=None):
+        # findings whose name (script id, nikto-<id>) or plugin matches, optionally
+        # only those whose detail contains text
+        query = 'SELECT plugin, address, port, finding, detail FROM findings WHERE (finding = ? OR plugin = ?)'
+        values = [finding, finding]
+        if text:
+            query += ' AND detail LIKE ?'
+            values.append('%%%s%%' % text)
+        with self.lock:
+            rows = self.db.execute(query, values).fetchall()
+        return sorted(rows, key=lambda row: (pack(row[1]), row[2] or 0, row[3], row[4]))
+
+    def summary(self):
+        with self.lock:
+            hosts = self.db.execute('SELECT COUNT(DISTINCT address) FROM results').fetchone()[0]
+            services = self.db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            findings = self.db.execute('SELECT COUNT(*) FROM findings').fetchone()[0]
+        return hosts, services, findings
@@ -0,0 +1,148 @@
+#! python3
+# masscan.py - runs masscan for omnislash.py and massNikto.py
+# Author- David Sullivan
+#
+# masscan() waits for the whole scan to finish, masscan_stream() reads masscan's
+# list output from a pipe and hands back each open port as soon as it is found.
+#
+# Large ranges can be split with masscan's own --shards x/y. masscan_sharded()
+# runs every shard locally at once, shard_specs() describes them as jobs for
+# other boxes, and merge_outputs() folds the shard outputs back into one
+# deduplicated output for cleanup() and the plugins.
+#
+# The target is whatever masscan takes for one, e.g. a comma separated list of
+# ranges or --includefile from pyscanners.targets.
+
+import json, logging, os, random, shlex, subprocess, threading
+from pyscanners.hostset import HostSet
+from pyscanners.parser import is_binary, parse_file, parse_line
+from pyscanners.services import banner_line, read_banners
+
+log = logging.getLogger(__name__)
+
+
+def rate_option(rate, banners=False):
+    # --rate in packets per second, masscan's own default when None,
+    # and --banners to have it grab what each service says
+    return (' --rate %d' % rate if rate else '') + (' --banners' if banners else '')
+
+
+def masscan(ports, target, output, rate=None, banners=False):
+    log.info('Running masscan against %s using ports %s', target, ports)
+    arguments = 'masscan -p %s %s --wait=0%s > %s' % (ports, target, rate_option(rate, banners), output)
+    os.system(arguments)
+
+
+def masscan_stream(ports, target, output, rate=None, stop=None):
+    # yields (address, port) for every new result, the raw list output is still
+    # saved to output so cleanup() can build the per-port files afterwards. Closing
+    # the generator early stops masscan instead of waiting for the rest of the scan,
+    # and so does setting stop (a threading.Event) from another thread
+    log.info('Streaming masscan against %s using ports %s', target, ports)
+    arguments = ['masscan', '-p', ports] + shlex.split(target) + ['--wait=0', '-oL', '-'] + rate_option(rate).split()
+    seen = {}
+
+    out = open(output, 'w')
+    process = subprocess.Popen(arguments, stdout=subprocess.PIPE, universal_newlines=True, bufsize=1)
+    finished = False
+
+    def watch():
+        # the reader is blocked on masscan's output, end masscan and the output ends too
+        while not stop.wait(0.5):
+            if process.poll() is not None:
+                return
+        if process.poll() is None:
+            process.terminate()
+
+    if stop is not None:
+        threading.Thread(target=watch, daemon=True).start()
+    try:
+        for line in process.stdout:
+            out.write(line)
+            result = parse_line(line)
+            if result is None:
+                continue
+            port, proto, address = result
+            if port not in seen:
+                seen[port] = HostSet()
+            if seen[port].add_new(address):
+                yield address, port
+        finished = True
+    finally:
+        if not finished and process.poll() is None:
+            process.terminate()
+        process.stdout.close()
+        process.wait()
+        out.close()
+
+
+def shard_specs(ports, target, output, shards, seed=None, rate=None, banners=False):
+    # every shard has to share the seed for masscan to split the range the same way
+    if seed is None:
+        seed = random.randint(1, 2 ** 31 - 1)
+    specs = []
+    for shard in range(1, shards + 1):
+        shardOutput = '%s.shard%dof%d' % (output, shard, shards)
+        specs.append({'shard': '%d/%d' % (shard, shards), 'seed': seed, 'target': target, 'ports': ports,
+                      'output': shardOutput,
+                      'command': 'masscan -p %s %s --wait=0 --shards %d/%d --seed %d%s -oL %s' % (
+                          ports, target, shard, shards, seed, rate_option(rate, banners), shardOutput)})
+    return specs
+
+
+def write_specs(specs, output):
+    # one json job spec per node, returns the files written
+    paths = []
+    for spec in specs:
+        path = '%s.json' % spec['output']
+        out = open(path, 'w')
+        json.dump(spec, out, indent=2)
+        out.close()
+        paths.append(path)
+    return paths
+
+
+def merge_outputs(paths, output):
+    # fold shard (or any other masscan) outputs into one deduplicated list output,
+    # banners included, returns the merged port -> HostSet buckets
+    buckets = {}
+    banners = {}
+    for path in paths:
+        for port, addresses in parse_file(path).items():
+            if port not in buckets:
+                buckets[port] = HostSet()
+            buckets[port].update(addresses)
+        if is_binary(path):
+            # banners are only read from the text formats
+            continue
+        for key, banner in read_banners(path).items():
+            if key not in banners or banner[0] == 'tls' or banners[key][0] is None:
+                banners[key] = banner
+
+    out = open(output, 'w')
+    out.write('#masscan\n')
+    for port in sorted(buckets):
+        for address in buckets[port]:
+            out.write('open tcp %d %s 0\n' % (port, address))
+    for (address, port), (tag, text) in sorted(banners.items()):
+        out.write(banner_line(port, address, tag, text))
+    out.write('# end\n')
+    out.close()
+    return buckets
+
+
+def masscan_sharded(ports, target, output, shards, rate=None, banners=False):
+    # run every shard at once on this box, then merge them into output,
+    # rate is each shard's share
+    log.info('Running masscan against %s using ports %s across %d shards', target, ports, shards)
+    specs = shard_specs(ports, target, output, shards, rate=rate, banners=banners)
+    processes = [subprocess.Popen(spec['command'], shell=True) for spec in specs]
+    for spec, process in zip(specs, processes):
+        if process.wait() != 0:
+            log.warning('masscan shard %s exited with %d', spec['shard'], process.returncode)
+
+    paths = [spec['output'] for spec in specs if os.path.exists(spec['output'])]
+    buckets = merge_outputs(paths, output)
+    for path in paths:
+        os.remove(path)
+    return buckets
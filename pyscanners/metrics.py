@@ -0,0 +1,205 @@
+#! python3
+# metrics.py - run timings and job counts for omnislash.py
+# Author- David Sullivan
+#
+# Metrics collects the wall time of each phase, job counts and latency histograms
+# per tool and per host, and masscan's result throughput. save() writes them as
+# output_metrics.json and as a Prometheus textfile (output_metrics.prom) for the
+# node_exporter textfile collector, and refresh() keeps both files up to date
+# during the run.
+#
+# Hosts only get a histogram in the JSON, the textfile just lists the slowest
+# hosts so a /16 does not turn into thousands of series.
+
+import bisect, collections, contextlib, json, os, threading, time
+
+# histogram bucket bounds in seconds, tuned for tools that take from a second to an hour
+latency_buckets = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+# hosts listed in the textfile
+top_hosts = 20
+
+
+class Histogram(object):
+    def __init__(self, bounds=latency_buckets):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.max = max(self.max, seconds)
+
+    def cumulative(self):
+        # (upper bound, observations at or below it) as Prometheus wants them, +Inf last
+        total = 0
+        for bound, count in zip(list(self.bounds) + ['+Inf'], self.counts):
+            total += count
+            yield bound, total
+
+    def as_dict(self):
+        return {'count': self.count, 'sum': round(self.sum, 3), 'max': round(self.max, 3),
+                'buckets': dict(('le_%s' % bound, count) for bound, count in self.cumulative())}
+
+
+class Metrics(object):
+    def __init__(self, run=''):
+        # run names the scan (the output name) and labels every series in the textfile
+        self.run = run
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.phases = collections.OrderedDict()
+        self.running = {}
+        self.jobs = collections.defaultdict(collections.Counter)
+        self.tools = collections.defaultdict(Histogram)
+        self.hosts = collections.defaultdict(Histogram)
+        self.counters = collections.Counter()
+        # seconds from the start of the run to the first job that found something
+        self.first_finding = None
+        self.stopped = None
+        self.refresher = None
+
+    def begin(self, name):
+        with self.lock:
+            self.running[name] = time.monotonic()
+
+    def end(self, name):
+        with self.lock:
+            start = self.running.pop(name, None)
+            if start is not None:
+                self.phases[name] = self.phases.get(name, 0.0) + time.monotonic() - start
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        self.begin(name)
+        try:
+            yield
+        finally:
+            self.end(name)
+
+    def add(self, name, value=1):
+        with self.lock:
+            self.counters[name] += value
+
+    def job_started(self, job):
+        # runner hook
+        with self.lock:
+            self.jobs[job.tool]['started'] += 1
+
+    def job_finished(self, job):
+        # runner hook, batched jobs share their time out between their hosts
+        with self.lock:
+            self.jobs[job.tool][job.status] += 1
+            if self.first_finding is None and any(job.findings.values()):
+                self.first_finding = time.time() - self.started
+            if job.status in ('deadline', 'down') and not job.elapsed:
+                return
+            self.tools[job.tool].observe(job.elapsed)
+            hosts = job.info.get('hosts') or [job.info.get('address')]
+            for address in hosts:
+                if address is not None:
+                    self.hosts[address].observe(job.elapsed / len(hosts))
+
+    def snapshot(self):
+        # everything as one JSON-friendly dict, phases still running count up to now
+        with self.lock:
+            now = time.monotonic()
+            phases = collections.OrderedDict(self.phases)
+            for name, start in self.running.items():
+                phases[name] = phases.get(name, 0.0) + now - start
+            results = self.counters['masscan_results']
+            masscan = phases.get('masscan', 0.0)
+            slowest = sorted(self.hosts.items(), key=lambda item: -item[1].sum)
+            return {
+                'run': self.run,
+                'started': self.started,
+                'updated': time.time(),
+                'finished': self.stopped is not None and self.stopped.is_set(),
+                'phases': dict((name, round(seconds, 3)) for name, seconds in phases.items()),
+                'masscan': {'results': results,
+                            'results_per_second': round(results / masscan, 3) if masscan else 0.0},
+                'counters': dict(self.counters),
+                'first_finding': round(self.first_finding, 3) if self.first_finding is not None else None,
+                'jobs': dict((tool, dict(counts)) for tool, counts in self.jobs.items()),
+                'tools': dict((tool, histogram.as_dict()) for tool, histogram in self.tools.items()),
+                'hosts': collections.OrderedDict((address, histogram.as_dict()) for address, histogram in slowest),
+            }
+
+    def prometheus(self, snapshot=None):
+        # the Prometheus text exposition format
+        snapshot = snapshot or self.snapshot()
+        run = 'run="%s"' % self.run.replace('\\', '\\\\').replace('"', '\\"')
+        lines = []
+
+        def metric(name, kind, text, samples):
+            lines.append('# HELP %s %s' % (name, text))
+            lines.append('# TYPE %s %s' % (name, kind))
+            for labels, value in samples:
+                lines.append('%s{%s} %s' % (name, ','.join([run] + labels), value))
+
+        metric('omnislash_phase_seconds', 'gauge', 'Wall time spent in each phase of the run.',
+               [(['phase="%s"' % name], seconds) for name, seconds in snapshot['phases'].items()])
+        metric('omnislash_masscan_results_total', 'counter', 'Open ports masscan reported.',
+               [([], snapshot['masscan']['results'])])
+        metric('omnislash_masscan_results_per_second', 'gauge', 'masscan results per second of the masscan phase.',
+               [([], snapshot['masscan']['results_per_second'])])
+        metric('omnislash_jobs_total', 'counter', 'Plugin jobs by tool and how they ended.',
+               [(['tool="%s"' % tool, 'status="%s"' % status], count)
+                for tool, counts in sorted(snapshot['jobs'].items()) for status, count in sorted(counts.items())])
+
+        with self.lock:
+            tools = sorted(self.tools.items())
+        lines.append('# HELP omnislash_job_seconds How long plugin jobs ran, by tool.')
+        lines.append('# TYPE omnislash_job_seconds histogram')
+        for tool, histogram in tools:
+            for bound, count in histogram.cumulative():
+                lines.append('omnislash_job_seconds_bucket{%s,tool="%s",le="%s"} %d' % (run, tool, bound, count))
+            lines.append('omnislash_job_seconds_sum{%s,tool="%s"} %s' % (run, tool, round(histogram.sum, 3)))
+            lines.append('omnislash_job_seconds_count{%s,tool="%s"} %d' % (run, tool, histogram.count))
+
+        if snapshot['first_finding'] is not None:
+            metric('omnislash_first_finding_seconds', 'gauge', 'Seconds into the run the first finding came in.',
+                   [([], snapshot['first_finding'])])
+        metric('omnislash_host_seconds', 'gauge', 'Plugin time spent on the %d slowest hosts.' % top_hosts,
+               [(['address="%s"' % address], values['sum'])
+                for address, values in list(snapshot['hosts'].items())[:top_hosts]])
+        metric('omnislash_last_update_timestamp_seconds', 'gauge', 'When these metrics were written.',
+               [([], round(snapshot['updated'], 3))])
+        return '\n'.join(lines) + '\n'
+
+    def save(self, output):
+        # output_metrics.json and output_metrics.prom, each replaced in one step so
+        # a collector never reads half a file
+        snapshot = self.snapshot()
+        for path, text in (('%s_metrics.json' % output, json.dumps(snapshot, indent=2)),
+                           ('%s_metrics.prom' % output, self.prometheus(snapshot))):
+            out = open(path + '.tmp', 'w')
+            out.write(text)
+            out.close()
+            os.replace(path + '.tmp', path)
+
+    def refresh(self, output, interval):
+        # rewrite the files every interval seconds until stop()
+        self.stopped = threading.Event()
+
+        def loop():
+            while not self.stopped.wait(interval):
+                self.save(output)
+
+        self.refresher = threading.Thread(target=loop)
+        self.refresher.daemon = True
+        self.refresher.start()
+
+    def stop(self, output=None):
+        # stops any refreshing and writes the final files
+        if self.stopped is None:
+            self.stopped = threading.Event()
+        self.stopped.set()
+        if self.refresher is not None:
+            self.refresher.join()
+        if output:
+            self.save(output)
@@ -0,0 +1,114 @@
+#! python3
+# nse.py - batches nmap NSE plugins into multi-host, multi-script runs
+# Author- David Sullivan
+#
+# Instead of one nmap process per host and plugin, every host found on a port is
+# fed to a single nmap run through -iL, with the scripts of every plugin that
+# targets that port combined into one --script list. The hosts come straight from
+# the in-memory results and the XML output (-oX) is split back into each plugin's
+# own per-host results and findings. The state nmap gives each host goes back to
+# pyscanners.health. The batching itself is pyscanners.batch's.
+
+import logging, os
+import xml.etree.ElementTree as ElementTree
+from pyscanners.batch import Batcher
+from pyscanners.findings import nmap_findings
+
+log = logging.getLogger(__name__)
+
+
+def format_script(script):
+    # render a script result the way nmap's normal output does
+    lines = (script.get('output') or '').strip('\n').split('\n')
+    if len(lines) == 1:
+        return '|_%s: %s\n' % (script.get('id'), lines[0].strip())
+    text = '| %s: \n' % script.get('id')
+    for line in lines[:-1]:
+        text += '| %s\n' % line
+    return text + '|_%s\n' % lines[-1]
+
+
+def split_results(xmlfile, port, plugins):
+    # plugins maps each plugin to the scripts it owns,
+    # returns {(plugin, address): text} for every host in the results
+    blocks = {}
+    root = ElementTree.parse(xmlfile).getroot()
+
+    for host in root.iter('host'):
+        address = host.find('address').get('addr')
+        for portElement in host.iter('port'):
+            if portElement.get('portid') != str(port):
+                continue
+            state = portElement.find('state')
+            service = portElement.find('service')
+            scripts = portElement.findall('script') + host.findall('hostscript/script')
+
+            for name, names in plugins.items():
+                text = 'Nmap scan report for %s\n%s/%s %s %s\n' % (
+                    address, port, portElement.get('protocol'), state.get('state') if state is not None else '',
+                    service.get('name') if service is not None else '')
+                for script in scripts:
+                    if script.get('id') in names:
+                        text += format_script(script)
+                blocks[(name, address)] = text + '\n'
+
+    return blocks
+
+
+def host_states(xmlfile, addresses):
+    # {address: 'up' or 'down'}, -oX leaves out the hosts nmap found down unless
+    # it runs verbose, so any host of the batch that is missing counts as down
+    states = dict((address, 'down') for address in addresses)
+    root = ElementTree.parse(xmlfile).getroot()
+    for host in root.iter('host'):
+        status = host.find('status')
+        address = host.find('address').get('addr')
+        if address in states and status is not None:
+            states[address] = 'up' if status.get('state') == 'up' else 'down'
+    return states
+
+
+class NSEBatcher(Batcher):
+    kind = 'nse'
+
+    def __init__(self, runner, output, plugins, batch_size=256):
+        # plugins maps plugin name -> its pyscanners.plugins.Plugin, which has scripts
+        Batcher.__init__(self, runner, output, batch_size)
+        self.plugins = plugins
+
+    def handles(self, name):
+        return name in self.plugins
+
+    def owners(self, port):
+        # every plugin on this port shares the run, each keeps its own scripts' results
+        return dict((name, set(plugin.scripts)) for name, plugin in self.plugins.items() if port in plugin.ports)
+
+    def names(self, port):
+        return sorted(self.owners(port))
+
+    def label(self, port):
+        return self.scripts(port)
+
+    def scripts(self, port):
+        scripts = []
+        for name, plugin in sorted(self.plugins.items()):
+            if port in plugin.ports:
+                scripts += [script for script in plugin.scripts if script not in scripts]
+        return ','.join(scripts)
+
+    def command(self, port, listfile, report):
+        return 'nmap -p %s --script %s -iL %s -oX %s' % (port, self.scripts(port), listfile, report)
+
+    def parse(self, job, port, report):
+        if job.status in ('timeout', 'deadline', 'down', 'cancelled'):
+            return
+        if not os.path.exists(report):
+            log.warning('nmap left no XML results in %s', report)
+            return
+        # each host's piece of the output and each plugin's findings go to the results store
+        owners = self.owners(port)
+        job.results = split_results(report, port, owners)
+        job.states = host_states(report, job.info['hosts'])
+        findings = nmap_findings(report)
+        for name, names in owners.items():
+            job.findings[name] = [finding for finding in findings if finding[2] in names]
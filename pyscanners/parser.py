@@ -0,0 +1,226 @@
+#! python3
+# parser.py - masscan output parsing shared by omnislash.py and massNikto.py
+# Author- David Sullivan
+#
+# cleanup() reads the masscan output once, buckets every result by port and then
+# writes each per-port file a single time, so the cost no longer grows with
+# ports x lines.
+#
+# parse_line() understands masscan's default console output as well as its list
+# (-oL) and JSON (-oJ) formats, so the same code reads a finished file or a pipe.
+#
+# Each port's addresses are kept in a HostSet, packed integers that are sorted and
+# deduplicated as they are merged, rather than a list of strings.
+#
+# parse_file() memory-maps the output. Files over chunk_size are cut into chunks
+# on line boundaries that a process pool parses side by side, their HostSets are
+# merged afterwards. masscan's binary output (-oB) is recognised by its header and
+# read record by record without decoding any text.
+
+import json, logging, mmap, multiprocessing, os, struct
+from concurrent.futures import ProcessPoolExecutor
+from pyscanners.hostset import HostSet, pack
+from pyscanners.portspec import PortSpec
+
+log = logging.getLogger(__name__)
+
+# text outputs bigger than this are split between worker processes
+chunk_size = 64 * 1024 * 1024
+
+# text is decoded and parsed this much at a time
+piece_size = 8 * 1024 * 1024
+
+# -oB files start with a record of their own that reads masscan/1.1...
+binary_magic = b'masscan/'
+
+# -oB open port records: (timestamp, ip, port) and (timestamp, ip, ip_proto, port)
+binary_open = struct.Struct('!II H')
+binary_open2 = struct.Struct('!II xH')
+
+
+def is_address(address):
+    # a whole IPv4 or IPv6 address, the last line of an interrupted masscan can be cut short
+    try:
+        pack(address)
+    except ValueError:
+        return False
+    return True
+
+
+def parse_line(line):
+    # returns (port, proto, address) for an open port result, None for anything else
+    fields = line.split()
+    if not fields:
+        return None
+
+    # console format: Discovered open port 80/tcp on 192.168.1.1
+    if fields[0] == 'Discovered':
+        if len(fields) < 6:
+            return None
+        port, sep, proto = fields[3].partition('/')
+        if not port.isdigit() or not is_address(fields[5]):
+            return None
+        return int(port), proto, fields[5]
+
+    # list format: open tcp 80 192.168.1.1 1517000000
+    if fields[0] == 'open':
+        if len(fields) < 4 or not fields[2].isdigit() or not is_address(fields[3]):
+            return None
+        return int(fields[2]), fields[1], fields[3]
+
+    # json format: one record per line inside a [ ] array, trailing comma included
+    if fields[0].startswith('{'):
+        try:
+            record = json.loads(line.strip().rstrip(','))
+            result = record['ports'][0]
+            if result.get('status') != 'open' or not is_address(record['ip']):
+                return None
+            return int(result['port']), result.get('proto', 'tcp'), record['ip']
+        except (ValueError, KeyError, IndexError, TypeError):
+            return None
+
+    return None
+
+
+def ip_key(address):
+    # numerical sort key for an IPv4 or IPv6 address
+    return pack(address)
+
+
+def is_binary(output):
+    f = open(output, 'rb')
+    start = f.read(len(binary_magic))
+    f.close()
+    return start == binary_magic
+
+
+def chunks(output, size=None):
+    # (start, end) byte ranges of about size (chunk_size) each that begin and end on a line boundary
+    size = size or chunk_size
+    length = os.path.getsize(output)
+    f = open(output, 'rb')
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    ranges = []
+    start = 0
+    while start < length:
+        end = data.find(b'\n', min(start + size, length - 1))
+        end = length if end == -1 else end + 1
+        ranges.append((start, end))
+        start = end
+    data.close()
+    f.close()
+    return ranges
+
+
+def parse_range(output, start, end):
+    # buckets for the lines between two byte offsets of a text output
+    buckets = {}
+    f = open(output, 'rb')
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    while start < end:
+        stop = data.find(b'\n', min(start + piece_size, end - 1), end)
+        stop = end if stop == -1 else stop + 1
+        for line in data[start:stop].decode('utf-8', 'replace').splitlines():
+            result = parse_line(line)
+            if result is None:
+                continue
+            port, proto, address = result
+            if port not in buckets:
+                buckets[port] = HostSet()
+            buckets[port].add(address)
+        start = stop
+    data.close()
+    f.close()
+    return buckets
+
+
+def parse_binary(output):
+    # buckets from masscan -oB: records are a type byte, a length (one byte, or
+    # two with the high bit set) and the record itself. Types 1 and 6 are open
+    # IPv4 ports, everything else (closed ports, banners, the header) is skipped
+    buckets = {}
+    f = open(output, 'rb')
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    size = len(data)
+    offset = 0
+    while offset + 2 <= size:
+        kind = data[offset]
+        length = data[offset + 1]
+        offset += 2
+        if length & 0x80:
+            if offset >= size:
+                break
+            length = (length & 0x7f) << 7 | (data[offset] & 0x7f)
+            offset += 1
+        record = offset
+        offset += length
+        if offset > size:
+            # cut short, e.g. masscan is still writing it
+            break
+        if kind == 1 and length >= binary_open.size:
+            timestamp, address, port = binary_open.unpack_from(data, record)
+        elif kind == 6 and length >= binary_open2.size:
+            timestamp, address, port = binary_open2.unpack_from(data, record)
+        else:
+            continue
+        if port not in buckets:
+            buckets[port] = HostSet()
+        buckets[port].add_packed(address)
+    data.close()
+    f.close()
+    return buckets
+
+
+def merge_buckets(buckets, more):
+    for port, addresses in more.items():
+        if port in buckets:
+            buckets[port].merge(addresses)
+        else:
+            buckets[port] = addresses
+    return buckets
+
+
+def parse_file(output, workers=None):
+    # bucket every result in the masscan output by port, duplicates are dropped,
+    # workers is the most processes to parse with (default one per CPU)
+    if not os.path.getsize(output):
+        return {}
+    if is_binary(output):
+        return parse_binary(output)
+    ranges = chunks(output)
+    workers = min(len(ranges), workers or os.cpu_count() or 1)
+    if workers < 2:
+        buckets = {}
+        for start, end in ranges:
+            merge_buckets(buckets, parse_range(output, start, end))
+        return buckets
+    buckets = {}
+    # spawned rather than forked, the runner's worker threads can already be busy
+    # with plugin jobs (omnislash -S) and fork only copies the calling thread
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        for result in pool.map(parse_range, [output] * len(ranges), *zip(*ranges)):
+            merge_buckets(buckets, result)
+    return buckets
+
+
+def cleanup(ports, target, output, write=True):
+    # ports is what was handed to masscan, as a PortSpec or its string form,
+    # write=False only parses and leaves the per-port files to the caller
+    wanted = ports if isinstance(ports, PortSpec) else PortSpec(ports)
+
+    log.info('Cleaning up output')
+    buckets = parse_file(output)
+    if write:
+        write_ports(buckets, wanted, output)
+    return buckets
+
+
+def write_ports(buckets, wanted, output):
+    # each port's unique addresses come out already sorted, write its file once
+    for port in sorted(buckets):
+        if port not in wanted:
+            continue
+        out = open('%s_%s' % (output, port), 'w')
+        for address in buckets[port]:
+            out.write(address + '\n')
+        out.close()
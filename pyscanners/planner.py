@@ -0,0 +1,99 @@
+#! python3
+# planner.py - turns cleaned up masscan results into a list of unique plugin jobs
+# Author- David Sullivan
+#
+# Sits between cleanup() and the plugins. Every (tool, host, port) job is only
+# planned once, and tools whose command does not take a port (enum4linux,
+# showmount) are collapsed to one job per host no matter how many of their
+# ports were open. plan_summary() gives the job count and a rough cost for
+# a --plan dry run.
+
+import math
+
+# rough seconds a single run of each tool takes against one host,
+# nmap is charged per batched run plus a little for every host in it
+tool_costs = {'nikto': 900, 'enum4linux': 120, 'showmount': 5, 'nmap': 20}
+nmap_host_cost = 2
+default_cost = 60
+
+
+def port_dependent(command):
+    # a command that never mentions the port gives the same answer for every port
+    return '%(port)s' in command
+
+
+def job_key(name, command, address, port):
+    return name, address, port if port_dependent(command) else None
+
+
+def plan(buckets, plugins, route=None):
+    # buckets maps port -> HostSet as returned by cleanup(),
+    # plugins is a list of (name, command, ports) in the order they should run,
+    # route(name, address, port) can turn down services a plugin is no use against,
+    # returns (jobs, duplicates) where jobs is a list of (name, address, port)
+    jobs = []
+    seen = set()
+    duplicates = 0
+    for name, command, ports in plugins:
+        for port in ports:
+            for address in buckets.get(port, ()):
+                if route is not None and not route(name, address, port):
+                    continue
+                key = job_key(name, command, address, port)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                jobs.append((name, address, port))
+    return jobs, duplicates
+
+
+def duration(seconds):
+    seconds = int(seconds)
+    if seconds < 60:
+        return '%ds' % seconds
+    if seconds < 3600:
+        return '%dm %02ds' % (seconds // 60, seconds % 60)
+    return '%dh %02dm' % (seconds // 3600, (seconds % 3600) // 60)
+
+
+def plan_summary(jobs, duplicates, tools, batched, batch_size=256, workers=1, limits=None, costs=None):
+    # tools maps plugin name -> the executable it runs, batched is the set of
+    # plugins whose hosts are combined into multi-host nmap runs, costs holds
+    # learned seconds per host that replace tool_costs
+    limits = limits or {}
+    costs = costs or {}
+    counts = {}
+    cost = {}
+    batches = {}
+    for name, address, port in jobs:
+        counts[name] = counts.get(name, 0) + 1
+        if name in batched:
+            batches.setdefault(port, set()).add(address)
+        else:
+            tool = tools[name]
+            cost[tool] = cost.get(tool, 0) + costs.get(tool, tool_costs.get(tool, default_cost))
+
+    # batched plugins on the same port share one nmap run per batch
+    runs = 0
+    for port, addresses in batches.items():
+        count = int(math.ceil(len(addresses) / float(max(1, batch_size))))
+        runs += count
+        if 'nmap' in costs:
+            cost['nmap'] = cost.get('nmap', 0) + len(addresses) * costs['nmap']
+        else:
+            cost['nmap'] = cost.get('nmap', 0) + count * tool_costs['nmap'] + len(addresses) * nmap_host_cost
+
+    lines = ['Plan: %d jobs (%d duplicate jobs removed)' % (len(jobs), duplicates)]
+    for name in sorted(counts):
+        lines.append('    %-12s %d' % (name, counts[name]))
+    if runs:
+        lines.append('    %d batched nmap runs' % runs)
+
+    # the slowest tool bounds the run, each tool can use up to its limit of the workers
+    serial = sum(cost.values())
+    wall = serial / float(max(1, workers))
+    for tool, seconds in cost.items():
+        wall = max(wall, seconds / float(max(1, min(workers, limits.get(tool, workers)))))
+    lines.append('Estimated tool time: %s serial, about %s with %d jobs' % (duration(serial), duration(wall), workers))
+    return lines
@@ -0,0 +1,73 @@
+#! python3
+# plugins.py - the tools omnislash.py can run against masscan's results
+# Author- David Sullivan
+#
+# Every plugin is one registry entry: its command line option, the ports it
+# cares about, the per-host command and where its results go. omnislash builds
+# its options, help text, job plan and NSE batches from this list, and hands the
+# plugins the port -> HostSet index cleanup() builds, so adding a tool only
+# means adding an entry here.
+
+
+class Plugin(object):
+    def __init__(self, name, option, label, command, suffix, ports, description, scripts=None, services=None,
+                 batch=None, discover=False):
+        # option is (short, long) for the command line, command is a template taking
+        # %(address)s and %(port)s, suffix names the results files, scripts lists the
+        # NSE scripts of nmap plugins (these are batched), services are the
+        # pyscanners.services tags the plugin is any use against (None for all).
+        # batch is a command template for running many hosts at once (pyscanners.web),
+        # taking %(hosts)s, %(report)s and %(maxtime)s, and discover also sends the
+        # plugin to any other port found talking one of its services
+        self.name = name
+        self.option = option
+        self.label = label
+        self.command = command
+        self.suffix = suffix
+        self.ports = ports
+        self.description = description
+        self.scripts = scripts
+        self.services = services
+        self.batch = batch
+        self.discover = discover
+
+    @property
+    def tool(self):
+        return self.command.split()[0]
+
+
+# in the order their jobs are queued
+registry = [
+    Plugin('ftpanon', ('f', 'ftpanon'), 'ftp-anon.nse', 'nmap -p %(port)s --script ftp-anon %(address)s',
+           'ftp-anon', [21], 'run the ftp-anon.nse plugin', scripts=['ftp-anon'], services={'ftp'}),
+    Plugin('nikto', ('n', 'nikto'), 'nikto', 'nikto -h %(address)s -p %(port)s', 'nikto', [80, 443],
+           'run the nikto plugin', services={'http', 'tls'},
+           batch='nikto -h %(hosts)s -ask no -Format xml -o %(report)s%(maxtime)s', discover=True),
+    Plugin('enum4linux', ('e', 'enum4linux'), 'enum4linux', 'enum4linux %(address)s',
+           'enum4linux', [137, 139, 445], 'run the enum4linux plugin', services={'smb'}),
+    Plugin('showmount', ('s', 'showmount'), 'showmount', 'showmount -e %(address)s',
+           'showmount', [2049], 'run the showmount plugin'),
+    Plugin('vncCheck', ('v', 'vnc'), 'vnc.nse scripts',
+           'nmap -p %(port)s --script vnc-info.nse --script realvnc-auth-bypass.nse %(address)s',
+           'vnc', [5900], 'run the vnc.nse scripts plugin', scripts=['vnc-info', 'realvnc-auth-bypass'],
+           services={'vnc'}),
+    Plugin('smtpRelay', ('m', 'mail'), 'smtp-open-relay.nse', 'nmap -p %(port)s --script smtp-open-relay %(address)s',
+           'smtpRelay', [25, 465, 587], 'run the smtp-open-relay.nse plugin', scripts=['smtp-open-relay'],
+           services={'smtp', 'tls'}),
+    Plugin('mysql', ('q', 'mysql'), 'mysql.nse scripts',
+           'nmap -p %(port)s --script mysql-enum.nse --script mysql-empty-password.nse %(address)s',
+           'mysql', [3306], 'run the mysql.nse plugins', scripts=['mysql-enum', 'mysql-empty-password'],
+           services={'mysql'}),
+    Plugin('mssql', ('i', 'mssql'), 'ms-sql-info.nse', 'nmap -p %(port)s --script ms-sql-info.nse %(address)s',
+           'mssql', [445, 1433], 'run the ms-sql-info.nse plugin', scripts=['ms-sql-info'], services={'smb', 'mssql'}),
+]
+
+plugins = dict((plugin.name, plugin) for plugin in registry)
+
+
+def all_ports():
+    # every port some plugin looks at, for -p all
+    ports = []
+    for plugin in registry:
+        ports += [port for port in plugin.ports if port not in ports]
+    return ports
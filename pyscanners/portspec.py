@@ -0,0 +1,64 @@
+#! python3
+# portspec.py - compact port specifications built from ranges
+# Author- David Sullivan
+#
+# PortSpec('1-1024,8000-8100') keeps the merged ranges for handing back to
+# masscan and a 64K bitmap for O(1) membership tests, so 'all' costs the same
+# as '80,443' instead of a 65,536 element comma string.
+
+# named specs understood on top of plain ports and ranges
+named_specs = {'all': '0-65535', 'wk': '0-1023'}
+
+
+class PortSpec(object):
+    def __init__(self, spec):
+        spec = named_specs.get(spec.strip(), spec)
+        ranges = []
+        for item in spec.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            low, sep, high = item.partition('-')
+            if not low.strip().isdigit() or (sep and not high.strip().isdigit()):
+                raise ValueError('bad port specification %r' % item)
+            low = int(low)
+            high = int(high) if sep else low
+            if low > high or high > 65535:
+                raise ValueError('bad port range %r' % item)
+            ranges.append((low, high))
+        if not ranges:
+            raise ValueError('no ports given')
+
+        # merge overlapping and touching ranges
+        ranges.sort()
+        self.ranges = [ranges[0]]
+        for low, high in ranges[1:]:
+            if low <= self.ranges[-1][1] + 1:
+                self.ranges[-1] = (self.ranges[-1][0], max(high, self.ranges[-1][1]))
+            else:
+                self.ranges.append((low, high))
+
+        self.bitmap = bytearray(65536)
+        for low, high in self.ranges:
+            self.bitmap[low:high + 1] = b'\x01' * (high - low + 1)
+
+    def __contains__(self, port):
+        try:
+            return 0 <= port <= 65535 and self.bitmap[port] == 1
+        except TypeError:
+            return False
+
+    def __len__(self):
+        return sum(high - low + 1 for low, high in self.ranges)
+
+    def __iter__(self):
+        for low, high in self.ranges:
+            for port in range(low, high + 1):
+                yield port
+
+    def __str__(self):
+        # masscan's -p syntax
+        return ','.join(str(low) if low == high else '%d-%d' % (low, high) for low, high in self.ranges)
+
+    def __repr__(self):
+        return 'PortSpec(%r)' % str(self)
@@ -0,0 +1,79 @@
+#! python3
+# ratecontrol.py - one scan budget shared by masscan and the plugins
+# Author- David Sullivan
+#
+# RateController holds the packets per second masscan may send (--rate, split
+# between shards) and how many plugin jobs may run at once. Concurrency is
+# adjusted while the run goes, the way TCP does it: it doubles while jobs keep
+# succeeding (slow start), then grows by about one job per round of successes,
+# and is halved whenever too many of the recent jobs timed out, failed or saw
+# their connections refused. That keeps the loud parallel mode (-j 32) to the
+# networks that can take it.
+
+import collections, logging, threading
+from pyscanners.health import unreachable_patterns
+
+log = logging.getLogger(__name__)
+
+# output that means the target or the network is struggling rather than the tool
+error_patterns = unreachable_patterns + [b'Connection refused', b'Connection reset']
+
+
+class RateController(object):
+    def __init__(self, jobs, rate=None, min_jobs=1, window=20, error_rate=0.2, backoff=0.5, on_change=None):
+        # jobs is the most plugin jobs ever allowed at once (-j), rate the packets per
+        # second for masscan (None leaves masscan's default), on_change is called
+        # with the new job count whenever it moves
+        self.max_jobs = max(1, jobs)
+        self.min_jobs = max(1, min(min_jobs, self.max_jobs))
+        self.rate = rate
+        self.window = window
+        self.error_rate = error_rate
+        self.backoff = backoff
+        self.on_change = on_change
+        self.limit = float(self.min_jobs)
+        self.slow_start = True
+        self.recent = collections.deque(maxlen=window)
+        self.since_backoff = 0
+        self.backoffs = 0
+        self.lock = threading.Lock()
+
+    @property
+    def jobs(self):
+        return int(self.limit)
+
+    def masscan_rate(self, shards=1):
+        # every shard gets an even share of the budget
+        if not self.rate:
+            return None
+        return max(1, self.rate // max(1, shards))
+
+    def failed(self, job):
+        if job.status in ('timeout', 'failed'):
+            return True
+        return any(pattern in job.output for pattern in error_patterns)
+
+    def observe(self, job):
+        # runner hook, jobs that never started or were stopped say nothing about the network
+        if job.status in ('deadline', 'down', 'cancelled'):
+            return
+        with self.lock:
+            before = self.jobs
+            failed = self.failed(job)
+            self.recent.append(failed)
+            self.since_backoff += 1
+            errors = sum(self.recent)
+            if len(self.recent) >= min(self.window, self.max_jobs) and errors >= self.error_rate * len(self.recent):
+                # once per window, so one burst of failures does not halve it to the floor
+                if self.since_backoff >= len(self.recent) // 2:
+                    self.limit = max(self.min_jobs, self.limit * self.backoff)
+                    self.slow_start = False
+                    self.since_backoff = 0
+                    self.backoffs += 1
+                    log.info('%d of the last %d jobs ran into errors, backing off to %d jobs',
+                             errors, len(self.recent), self.jobs)
+            elif not failed:
+                self.limit = min(self.max_jobs, self.limit + (1 if self.slow_start else 1 / self.limit))
+            after = self.jobs
+        if after != before and self.on_change:
+            self.on_change(after)
@@ -0,0 +1,289 @@
+#! python3
+# runner.py - runs plugin commands on a pool of worker threads
+# Author- David Sullivan
+#
+# Every job's output is captured on its own and only appended to the shared
+# results file (if it has one) once the job is done, so concurrent runs never
+# interleave.
+# A global job count caps the pool and per-tool limits (nikto=4,nmap=16) cap
+# how many copies of one tool may run at the same time. set_concurrency() lowers
+# or raises how much of the pool is used while the run goes.
+#
+# Jobs are also supervised: each tool can get a wall-clock timeout, the whole run
+# can get a deadline, and a job that runs over has its entire process group killed
+# (nikto started through the shell included). Jobs that time out or never get to
+# start before the deadline are kept in timed_out so they can be retried later.
+# stop() ends a run early: queued jobs are dropped and running ones killed.
+#
+# Which queued job starts next is up to a pyscanners.scheduler.Scheduler
+# (priority, then a fair share per tool, then the quickest job first), and a skip
+# hook (pyscanners.health) can still turn it away when it is about to start, or
+# take hosts that have gone down out of a batch before its host list is written.
+
+import collections, json, logging, os, signal, subprocess, threading, time
+from pyscanners.scheduler import Scheduler
+
+log = logging.getLogger(__name__)
+
+
+def parse_limits(spec):
+    # 'nikto=4,nmap=16,enum4linux=2' -> {'nikto': 4, 'nmap': 16, 'enum4linux': 2},
+    # also used for the per-tool timeouts in seconds. 0 is an error for both: a
+    # tool that may never run would leave wait() blocked on its jobs, and a tool
+    # with no seconds would have every job killed, leave the tool out instead
+    limits = {}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        tool, sep, count = item.partition('=')
+        if not sep or not count.strip().isdigit() or int(count) < 1:
+            raise ValueError('bad limit %r, expected tool=count of at least 1' % item)
+        limits[tool.strip()] = int(count)
+    return limits
+
+
+class Job(object):
+    def __init__(self, tool, arguments, outfile, message=None, done=None, info=None, start=None):
+        self.tool = tool
+        self.arguments = arguments
+        self.outfile = outfile
+        self.message = message
+        self.done = done
+        self.start = start
+        # extra details (address, port, ...) saved with the job if it times out
+        self.info = info or {}
+        # pending, done, failed, timeout, deadline, down or cancelled
+        self.status = 'pending'
+        self.elapsed = 0.0
+        # seconds the scheduler expects the job to take
+        self.estimate = 0.0
+        # captured output, plus per (plugin, address) output for jobs that cover several
+        self.output = b''
+        self.results = {}
+        # plugin -> parsed (address, port, finding, detail) tuples
+        self.findings = {}
+        # address -> 'up' or 'down' for the hosts of a batch, as far as its report tells
+        self.states = {}
+
+
+class Runner(object):
+    def __init__(self, jobs=1, limits=None, timeouts=None, deadline=None, on_finish=None, on_start=None,
+                 scheduler=None, skip=None):
+        # deadline is the number of seconds the whole run may take from now,
+        # on_finish is called with every job once it has ended, however it ended,
+        # on_start with every job whose command is about to be started, skip with
+        # every job before that and returns the status to end it with instead, or None
+        self.on_finish = on_finish
+        self.on_start = on_start
+        self.skip = skip
+        for tool, count in list((limits or {}).items()) + list((timeouts or {}).items()):
+            if count < 1:
+                raise ValueError('bad limit %s=%s, expected at least 1' % (tool, count))
+        self.jobs = max(1, jobs)
+        self.concurrency = self.jobs
+        self.limits = limits or {}
+        self.timeouts = timeouts or {}
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.timed_out = []
+        self.pending = scheduler or Scheduler()
+        self.running = collections.Counter()
+        self.processes = {}
+        self.closed = False
+        self.stopped = False
+        self.condition = threading.Condition()
+        self.file_locks = collections.defaultdict(threading.Lock)
+        self.workers = []
+        for i in range(self.jobs):
+            worker = threading.Thread(target=self._worker)
+            worker.daemon = True
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, arguments, outfile, message=None, done=None, start=None, **info):
+        # the tool is the command's executable, which is what the limits are keyed on,
+        # done is called with the finished job once its output has been saved, start
+        # right before its command runs (batches write their host list then), a
+        # timeout in info replaces the tool's for this job
+        job = Job(arguments.split()[0], arguments, outfile, message, done, info, start)
+        with self.condition:
+            if self.stopped:
+                job.status = 'cancelled'
+                return job
+            self.pending.push(job)
+            self.condition.notify()
+        return job
+
+    def wait(self):
+        # no more jobs are coming, block until the queue is drained
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        for worker in self.workers:
+            worker.join()
+
+    def cancel(self):
+        # drop the jobs that have not started and wait for the running ones
+        with self.condition:
+            self.pending.clear()
+        self.wait()
+
+    def stop(self):
+        # drop the queued jobs and kill the running ones (status 'cancelled'), from any thread
+        with self.condition:
+            self.stopped = True
+            self.pending.clear()
+            processes = list(self.processes.values())
+            self.condition.notify_all()
+        for process in processes:
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def set_concurrency(self, count):
+        # how many of the workers may run jobs, between 1 and jobs
+        with self.condition:
+            self.concurrency = max(1, min(self.jobs, count))
+            self.condition.notify_all()
+
+    def _next(self):
+        # the scheduler's pick among tools under their limit, called with the lock held
+        if sum(self.running.values()) >= self.concurrency:
+            return None
+        return self.pending.pop(self.running, self.limits)
+
+    def _worker(self):
+        while True:
+            with self.condition:
+                job = self._next()
+                while job is None:
+                    if self.closed and not self.pending:
+                        return
+                    self.condition.wait()
+                    job = self._next()
+                self.running[job.tool] += 1
+
+            try:
+                self._run(job)
+            finally:
+                with self.condition:
+                    self.running[job.tool] -= 1
+                    self.condition.notify_all()
+
+    def save_timeouts(self, path):
+        # machine readable list of the jobs that timed out or never started
+        out = open(path, 'w')
+        json.dump(self.timed_out, out, indent=2)
+        out.close()
+
+    def _limit(self, job):
+        # the job's own timeout or its tool's, None for no limit
+        limit = job.info.get('timeout')
+        return self.timeouts.get(job.tool) if limit is None else limit
+
+    def _timeout(self, job):
+        # seconds this job may run for, None for no limit
+        limit = self._limit(job)
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if limit is None or remaining < limit:
+                return max(remaining, 0)
+        return limit
+
+    def _record(self, job, status):
+        job.status = status
+        record = {'tool': job.tool, 'command': job.arguments, 'outfile': job.outfile,
+                  'reason': status, 'elapsed': round(job.elapsed, 1)}
+        record.update(job.info)
+        with self.condition:
+            self.timed_out.append(record)
+
+    def _run(self, job):
+        if self.stopped:
+            job.status = 'cancelled'
+            self._finish(job)
+            return
+        timeout = self._timeout(job)
+        if timeout == 0:
+            # out of time before the job got to start
+            self._record(job, 'deadline')
+            self._finish(job)
+            return
+        reason = self.skip(job) if self.skip else None
+        if reason:
+            self._record(job, reason)
+            self._finish(job)
+            return
+        if job.info.get('down'):
+            # hosts the skip hook took out of a batch, listed so they can be run later
+            record = {'tool': job.tool, 'command': job.arguments, 'outfile': job.outfile, 'reason': 'down',
+                      'elapsed': 0.0}
+            record.update(job.info)
+            record['hosts'] = record.pop('down')
+            with self.condition:
+                self.timed_out.append(record)
+        if job.start:
+            try:
+                job.start(job)
+            except Exception as err:
+                # e.g. a batch's host list could not be written, the job fails rather than its worker
+                log.warning('Could not start "%s": %s', job.arguments, err)
+                job.status = 'failed'
+                self._finish(job)
+                return
+
+        if job.message:
+            log.info(job.message)
+        if self.on_start:
+            self.on_start(job)
+        start = time.monotonic()
+        process = subprocess.Popen(job.arguments, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   start_new_session=True)
+        with self.condition:
+            self.processes[job] = process
+            stopped = self.stopped
+        if stopped:
+            os.killpg(process.pid, signal.SIGKILL)
+        try:
+            output = process.communicate(timeout=timeout)[0]
+        except subprocess.TimeoutExpired:
+            # the shell leads its own process group, take the tool down with it
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+            process.communicate()
+            job.elapsed = time.monotonic() - start
+            self._record(job, 'deadline' if timeout != self._limit(job) else 'timeout')
+            log.warning('%s timed out after %ds: %s', job.tool, job.elapsed, job.arguments)
+            self._finish(job)
+            return
+        finally:
+            with self.condition:
+                self.processes.pop(job, None)
+
+        job.elapsed = time.monotonic() - start
+        if self.stopped:
+            job.status = 'cancelled'
+            self._finish(job)
+            return
+        job.status = 'done' if process.returncode == 0 else 'failed'
+        job.output = output
+        if job.outfile:
+            with self.file_locks[job.outfile]:
+                out = open(job.outfile, 'ab')
+                out.write(output)
+                out.close()
+        self._finish(job)
+
+    def _finish(self, job):
+        if job.done:
+            try:
+                job.done(job)
+            except Exception as err:
+                # results that could not be read are not a finished job, -R runs it again
+                log.warning('Could not process the results of "%s": %s', job.arguments, err)
+                if job.status == 'done':
+                    job.status = 'failed'
+        if self.on_finish:
+            self.on_finish(job)
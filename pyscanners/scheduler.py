@@ -0,0 +1,159 @@
+#! python3
+# scheduler.py - decides which queued plugin job runs next
+# Author- David Sullivan
+#
+# Jobs wait in one queue per tool. When a worker comes free the scheduler takes
+# the highest priority job first, then shares the workers out between tools (the
+# tool with the fewest jobs running goes next) and, between tools on an equal
+# footing, starts the one expected to finish soonest. Quick NSE checks therefore
+# no longer sit behind hours of nikto, and nikto still gets its share.
+#
+# How long a job is expected to take comes from Estimates, which learns each
+# tool's average time per host from finished jobs and keeps it between runs in
+# ~/.omnislash/estimates.json. planner.tool_costs is used until a tool has history.
+
+import heapq, ipaddress, itertools, json, logging, os
+from pyscanners.planner import default_cost, nmap_host_cost, tool_costs
+
+log = logging.getLogger(__name__)
+
+estimates_path = os.path.join(os.path.expanduser('~'), '.omnislash', 'estimates.json')
+
+
+def parse_priorities(spec):
+    # 'nikto=2,10.0.0.0/24=5,10.1.1.1=9' -> ({'nikto': 2}, [(network, 5), (network, 9)]),
+    # higher runs first, anything not listed is 0
+    tools = {}
+    networks = []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, sep, value = item.partition('=')
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError('bad priority %r, expected tool=n or address=n' % item)
+        try:
+            networks.append((ipaddress.ip_network(name.strip(), strict=False), value))
+        except ValueError:
+            tools[name.strip()] = value
+    return tools, networks
+
+
+class Estimates(object):
+    def __init__(self, path=None, weight=0.3):
+        # weight is how much each new run moves the average
+        self.path = path
+        self.weight = weight
+        self.seconds = {}
+        self.runs = {}
+        if path and os.path.exists(path):
+            try:
+                f = open(path, 'r')
+                saved = json.load(f)
+                f.close()
+                for tool, values in saved.items():
+                    self.seconds[tool] = float(values['seconds'])
+                    self.runs[tool] = int(values['runs'])
+            except (ValueError, KeyError, TypeError) as err:
+                log.warning('Ignoring the runtime estimates in %s: %s', path, err)
+
+    def host_cost(self, tool):
+        # seconds per host, learned or the planner's guess
+        if tool in self.seconds:
+            return self.seconds[tool]
+        if tool == 'nmap':
+            return nmap_host_cost
+        return tool_costs.get(tool, default_cost)
+
+    def costs(self):
+        # tool -> seconds per host for every tool with history, for plan_summary()
+        return dict(self.seconds)
+
+    def job(self, job):
+        # expected seconds for a queued job, batches cost their start up plus each host
+        hosts = len(job.info.get('hosts') or ())
+        if not hosts:
+            return self.host_cost(job.tool)
+        if job.tool in self.seconds:
+            return self.seconds[job.tool] * hosts
+        return tool_costs.get(job.tool, default_cost) + self.host_cost(job.tool) * hosts
+
+    def observe(self, job):
+        # runner hook, a timeout still says the tool takes at least that long
+        if job.status not in ('done', 'failed', 'timeout') or not job.elapsed:
+            return
+        seconds = job.elapsed / max(1, len(job.info.get('hosts') or ()))
+        if job.tool in self.seconds:
+            seconds = (1 - self.weight) * self.seconds[job.tool] + self.weight * seconds
+        self.seconds[job.tool] = seconds
+        self.runs[job.tool] = self.runs.get(job.tool, 0) + 1
+
+    def save(self):
+        if not self.path or not self.seconds:
+            return
+        folder = os.path.dirname(self.path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        out = open(self.path + '.tmp', 'w')
+        json.dump(dict((tool, {'seconds': round(self.seconds[tool], 3), 'runs': self.runs.get(tool, 0)})
+                       for tool in self.seconds), out, indent=2)
+        out.close()
+        os.replace(self.path + '.tmp', self.path)
+
+
+class Scheduler(object):
+    def __init__(self, estimates=None, priorities=None):
+        # priorities as returned by parse_priorities()
+        self.estimates = estimates or Estimates()
+        self.tools, self.networks = priorities or ({}, [])
+        self.queues = {}
+        self.order = itertools.count()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        # drop every queued job, returns how many there were
+        count = self.count
+        self.queues = {}
+        self.count = 0
+        return count
+
+    def priority(self, job):
+        value = self.tools.get(job.tool, 0)
+        if self.networks:
+            for address in job.info.get('hosts') or [job.info.get('address')]:
+                if address is None:
+                    continue
+                host = ipaddress.ip_address(address)
+                for network, priority in self.networks:
+                    if host in network:
+                        value = max(value, priority)
+        return value
+
+    def push(self, job):
+        job.estimate = self.estimates.job(job)
+        heapq.heappush(self.queues.setdefault(job.tool, []),
+                       (-self.priority(job), job.estimate, next(self.order), job))
+        self.count += 1
+
+    def pop(self, running, limits):
+        # the next job to start given how many of each tool are running, None if
+        # every tool with work waiting is at its limit
+        best = None
+        for tool, queue in self.queues.items():
+            if not queue:
+                continue
+            limit = limits.get(tool)
+            if limit is not None and running[tool] >= limit:
+                continue
+            priority, estimate, order, job = queue[0]
+            key = (priority, running[tool], estimate, order)
+            if best is None or key < best[0]:
+                best = (key, tool)
+        if best is None:
+            return None
+        self.count -= 1
+        return heapq.heappop(self.queues[best[1]])[3]
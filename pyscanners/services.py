@@ -0,0 +1,161 @@
+#! python3
+# services.py - works out what is actually listening on each open port
+# Author- David Sullivan
+#
+# masscan only says a port is open. With --banners it also grabs what the service
+# says first, and parse_banner() reads those lines back. For masscan runs without
+# banners, probe() connects to every result itself (asyncio, a few hundred at a
+# time) and looks at the greeting, an HTTP HEAD or a TLS handshake. Either way
+# each (address, port) gets a tag such as http, tls, ftp, smtp, vnc or mysql, so
+# plugins are only sent to services that speak their protocol.
+#
+# A port that could not be classified keeps every plugin, only a clear mismatch
+# is skipped.
+
+import asyncio, ssl
+from pyscanners.health import probe_timeout
+
+# masscan's banner protocol names -> tags
+masscan_services = {'http': 'http', 'title': 'http', 'http.server': 'http', 'ssl': 'tls', 'X509': 'tls',
+                    'ftp': 'ftp', 'smtp': 'smtp', 'vnc': 'vnc', 'ssh': 'ssh', 'smb': 'smb', 'pop3': 'pop3',
+                    'imap4': 'imap', 'telnet': 'telnet', 'rdp': 'rdp', 'memcached': 'memcached'}
+
+# probes in flight at once, each waits probe_timeout for a connection or an answer
+probe_concurrency = 256
+
+
+def parse_banner(line):
+    # returns (port, address, tag, text) for a masscan banner line, None for anything else
+    fields = line.split()
+    if not fields:
+        return None
+
+    # list format: banner tcp 80 192.168.1.1 1517000000 http HTTP/1.1 200 OK
+    if fields[0] == 'banner':
+        if len(fields) < 6 or not fields[2].isdigit():
+            return None
+        text = line.split(None, 6)[6].strip() if len(fields) > 6 else ''
+        return int(fields[2]), fields[3], masscan_services.get(fields[5]), text
+
+    # console format: Banner on port 80/tcp on 192.168.1.1: [http] HTTP/1.1 200 OK
+    if fields[0] == 'Banner' and len(fields) >= 7:
+        port = fields[3].partition('/')[0]
+        if not port.isdigit():
+            return None
+        name = fields[6].strip('[]')
+        text = line.split(']', 1)[1].strip() if ']' in line else ''
+        return int(port), fields[5].rstrip(':'), masscan_services.get(name), text
+
+    return None
+
+
+def banner_line(port, address, tag, text):
+    # list format banner line, for merged outputs
+    names = dict((value, key) for key, value in masscan_services.items() if key not in ('title', 'X509'))
+    return 'banner tcp %d %s 0 %s %s\n' % (port, address, names.get(tag, tag or 'unknown'), text)
+
+
+def read_banners(output):
+    # {(address, port): (tag, text)} from a masscan output, the first banner that
+    # names a service wins, except that a TLS banner always does
+    services = {}
+    f = open(output, 'r')
+    for line in f:
+        result = parse_banner(line)
+        if result is None:
+            continue
+        port, address, tag, text = result
+        key = (address, port)
+        if key not in services or tag == 'tls' or (tag and services[key][0] is None):
+            services[key] = (tag, text[:200])
+    f.close()
+    return services
+
+
+def classify_greeting(data):
+    # tag for what a server says before the client speaks, None if it is not clear
+    if data.startswith(b'SSH-'):
+        return 'ssh'
+    if data.startswith(b'RFB '):
+        return 'vnc'
+    if len(data) > 5 and data[3] == 0 and data[4] in (0x0a, 0xff):
+        # MySQL handshake (protocol 10) or its "host is not allowed" error packet
+        return 'mysql'
+    if data.startswith(b'HTTP/'):
+        return 'http'
+    text = data.lower()
+    if data.startswith(b'220'):
+        if b'ftp' in text:
+            return 'ftp'
+        if b'smtp' in text or b'mail' in text:
+            return 'smtp'
+    if data.startswith(b'+OK'):
+        return 'pop3'
+    if data.startswith(b'* OK'):
+        return 'imap'
+    return None
+
+
+async def _probe(address, port):
+    # wait for a greeting, ask for HTTP if there is none
+    data = b''
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port), probe_timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None, ''
+    try:
+        try:
+            data = await asyncio.wait_for(reader.read(256), probe_timeout / 2)
+        except asyncio.TimeoutError:
+            writer.write(b'HEAD / HTTP/1.0\r\nHost: %s\r\n\r\n' % address.encode())
+            await writer.drain()
+            data = await asyncio.wait_for(reader.read(256), probe_timeout)
+    except (OSError, asyncio.TimeoutError):
+        pass
+    finally:
+        writer.close()
+    tag = classify_greeting(data)
+    if tag == 'mysql':
+        # the server version follows the 4 byte packet header and protocol byte
+        return tag, data[5:].split(b'\0')[0].decode('latin-1')
+    if tag:
+        return tag, data.split(b'\n')[0].decode('latin-1').strip()
+
+    # nothing it recognised, see if the port talks TLS
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(address, port, ssl=context),
+                                                probe_timeout)
+    except (OSError, ssl.SSLError, asyncio.TimeoutError):
+        return None, data.split(b'\n')[0].decode('latin-1').strip()
+    writer.close()
+    return 'tls', ''
+
+
+async def _probe_all(targets):
+    # a fixed pool of probes working through one shared iterator, so a /8 does not
+    # become millions of coroutines at once
+    results = {}
+    pending = iter(targets)
+
+    async def worker():
+        for address, port in pending:
+            results[(address, port)] = await _probe(address, port)
+
+    await asyncio.gather(*[worker() for i in range(probe_concurrency)])
+    return results
+
+
+def probe(targets):
+    # targets is a list of (address, port), returns {(address, port): (tag, text)}
+    targets = list(targets)
+    if not targets:
+        return {}
+    return asyncio.run(_probe_all(targets))
+
+
+def accepts(plugin, tag):
+    # unknown services and plugins without a service list get every port
+    return tag is None or plugin.services is None or tag in plugin.services
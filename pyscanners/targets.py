@@ -0,0 +1,180 @@
+#! python3
+# targets.py - target lists merged into ranges for a single masscan run
+# Author- David Sullivan
+#
+# A TargetSet takes CIDRs, start-end ranges and single addresses (from -t or
+# whole inventory files), keeps them as integer intervals and merges overlapping
+# and touching ones, so an inventory of hundreds of networks and a few million
+# addresses becomes a short sorted list of ranges. Exclusions are subtracted in
+# one sweep over both lists. masscan_target() hands the result to masscan on the
+# command line, or through --includefile once there are too many ranges.
+
+import bisect, hashlib, heapq, ipaddress
+from pyscanners.hostset import pack, pack_ipv4, unpack
+
+# more ranges than this go to masscan in a file instead of on the command line
+inline_ranges = 64
+
+
+def parse_target(item):
+    # '10.0.0.0/24', '10.0.0.1-10.0.0.9' or '10.0.0.1' -> (version, start, end)
+    item = item.strip()
+    if '-' in item:
+        low, sep, high = item.partition('-')
+        try:
+            (version, start), (other, end) = pack(low.strip()), pack(high.strip())
+        except ValueError:
+            raise ValueError('bad target range %r' % item)
+        if version != other or start > end:
+            raise ValueError('bad target range %r' % item)
+        return version, start, end
+    if '/' not in item:
+        try:
+            # the common case in big inventories, skip ipaddress
+            value = pack_ipv4(item)
+            return 4, value, value
+        except ValueError:
+            pass
+    try:
+        network = ipaddress.ip_network(item, strict=False)
+    except ValueError:
+        raise ValueError('bad target %r, expected an address, network or range' % item)
+    return network.version, int(network.network_address), int(network.broadcast_address)
+
+
+def runs(values):
+    # sorted integers -> intervals of consecutive ones
+    intervals = []
+    start = end = None
+    for value in values:
+        if end is not None and value <= end + 1:
+            end = value
+            continue
+        if end is not None:
+            intervals.append((start, end))
+        start = end = value
+    if end is not None:
+        intervals.append((start, end))
+    return intervals
+
+
+def merge(intervals):
+    # intervals sorted by their start -> non-overlapping ones, touching ones joined
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract(intervals, holes):
+    # both merged, returns what is left of intervals outside holes
+    left = []
+    first = 0
+    for start, end in intervals:
+        while first < len(holes) and holes[first][1] < start:
+            first += 1
+        current = start
+        for low, high in holes[first:]:
+            if low > end:
+                break
+            if low > current:
+                left.append((current, low - 1))
+            current = max(current, high + 1)
+        if current <= end:
+            left.append((current, end))
+    return left
+
+
+class TargetSet(object):
+    def __init__(self, items=()):
+        # single addresses are kept apart as plain integers, which sort far faster
+        # than millions of one address intervals
+        self.intervals = {4: [], 6: []}
+        self.singles = {4: [], 6: []}
+        self.merged = True
+        self.update(items)
+
+    def add(self, item):
+        version, start, end = parse_target(item)
+        if start == end:
+            self.singles[version].append(start)
+        else:
+            self.intervals[version].append((start, end))
+        self.merged = False
+
+    def update(self, items):
+        for item in items:
+            if item.strip():
+                self.add(item)
+
+    def load(self, path):
+        # one or more targets per line, separated by commas or spaces, # starts a comment
+        f = open(path, 'r')
+        for line in f:
+            self.update(line.split('#', 1)[0].replace(',', ' ').split())
+        f.close()
+
+    def ranges(self, version=4):
+        if not self.merged:
+            for key in self.intervals:
+                self.intervals[key] = merge(heapq.merge(sorted(self.intervals[key]),
+                                                        runs(sorted(self.singles[key]))))
+                self.singles[key] = []
+            self.merged = True
+        return self.intervals[version]
+
+    def subtract(self, other):
+        # a new TargetSet without anything in other
+        result = TargetSet()
+        for version in (4, 6):
+            result.intervals[version] = subtract(self.ranges(version), other.ranges(version))
+        return result
+
+    def size(self):
+        # number of addresses, len() cannot hold an IPv6 /64
+        return sum(end - start + 1 for version in (4, 6) for start, end in self.ranges(version))
+
+    def __bool__(self):
+        return bool(self.ranges(4) or self.ranges(6))
+
+    def __contains__(self, address):
+        version, value = pack(address)
+        intervals = self.ranges(version)
+        i = bisect.bisect_right(intervals, (value, float('inf'))) - 1
+        return i >= 0 and intervals[i][0] <= value <= intervals[i][1]
+
+    def count(self):
+        # number of ranges once merged
+        return len(self.ranges(4)) + len(self.ranges(6))
+
+    def __iter__(self):
+        # masscan's spelling of each range
+        for version in (4, 6):
+            for start, end in self.ranges(version):
+                if start == end:
+                    yield unpack(version, start)
+                else:
+                    yield '%s-%s' % (unpack(version, start), unpack(version, end))
+
+    def name(self):
+        # stable short name for output files, the same inventory always gets the same one
+        digest = hashlib.sha1('\n'.join(self).encode()).hexdigest()[:8]
+        return '%d-ranges-%s' % (self.count(), digest)
+
+    def write(self, path):
+        out = open(path, 'w')
+        for item in self:
+            out.write(item + '\n')
+        out.close()
+
+    def masscan_target(self, output):
+        # what goes where masscan expects its target
+        if self.count() <= inline_ranges:
+            return ','.join(self)
+        path = '%s_targets' % output
+        self.write(path)
+        return '--includefile %s' % path
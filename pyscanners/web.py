@@ -0,0 +1,89 @@
+#! python3
+# web.py - the web scan engine shared by omnislash.py and massNikto.py
+# Author- David Sullivan
+#
+# Rather than one nikto process per host, WebBatcher collects the web services
+# found on each port and hands nikto a whole list of them through -h <file>
+# (https:// for the ones that talk TLS), with -maxtime capping the time nikto
+# spends on any one host. nikto's XML report is parsed into findings and split
+# back into a short text report per host.
+#
+# A tool timeout (-T nikto=1800) stays a limit per host: it becomes nikto's
+# -maxtime when none is given, and the batch as a whole may run for that long
+# per host in it, plus once more for nikto's own start up and report.
+#
+# The batching itself is pyscanners.batch's. Hosts nikto reports on count as up
+# and, once the whole list has been through, the missing ones as down.
+
+import collections, logging, os
+import xml.etree.ElementTree as ElementTree
+from pyscanners.batch import Batcher
+from pyscanners.findings import nikto_findings
+
+log = logging.getLogger(__name__)
+
+
+def host_reports(findings, addresses, port):
+    # {address: text} for every host in the batch, hosts without findings included
+    lines = collections.defaultdict(list)
+    for address, iPort, finding, detail in findings:
+        lines[address].append('+ %s: %s\n' % (finding, detail))
+    return dict((address, 'Nikto report for %s:%s\n%s\n' % (address, port, ''.join(lines[address])))
+                for address in addresses)
+
+
+def tested_hosts(report):
+    # the addresses nikto's XML report has a scan of, with or without items
+    root = ElementTree.parse(report).getroot()
+    return set(details.get('targetip') or details.get('targethostname') for details in root.iter('scandetails'))
+
+
+class WebBatcher(Batcher):
+    kind = 'web'
+
+    def __init__(self, runner, output, plugin, batch_size=16, maxtime=None, outfile=None):
+        # plugin is the pyscanners.plugins.Plugin with the batch command, maxtime the
+        # seconds nikto may spend per host
+        Batcher.__init__(self, runner, output, batch_size, outfile)
+        self.plugin = plugin
+        self.maxtime = maxtime
+
+    def handles(self, name):
+        return self.plugin is not None and name == self.plugin.name
+
+    def names(self, port):
+        return [self.plugin.name]
+
+    def line(self, address, port, tls):
+        return ('https://%s:%s/\n' if tls else '%s:%s\n') % (address, port)
+
+    def label(self, port):
+        return self.plugin.label
+
+    def limit(self):
+        return self.runner.timeouts.get(self.plugin.tool)
+
+    def command(self, port, listfile, report):
+        maxtime = self.maxtime or self.limit()
+        return self.plugin.batch % {'hosts': listfile, 'report': report,
+                                    'maxtime': ' -maxtime %ds' % maxtime if maxtime else ''}
+
+    def timeout(self, count):
+        limit = self.limit()
+        return limit * (count + 1) if limit else None
+
+    def parse(self, job, port, report):
+        finished = job.status in ('done', 'failed')
+        if not os.path.exists(report):
+            if finished:
+                log.warning('nikto left no report in %s', report)
+            return
+        # a batch that was stopped still keeps what nikto reported before that
+        name = self.plugin.name
+        findings = nikto_findings(report)
+        job.findings[name] = findings
+        job.results = dict(((name, address), text) for address, text in
+                           host_reports(findings, job.info['hosts'], port).items())
+        tested = tested_hosts(report)
+        job.states = dict((address, 'up' if address in tested else 'down')
+                          for address in job.info['hosts'] if finished or address in tested)